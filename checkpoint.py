@@ -0,0 +1,100 @@
+import sqlite3
+import time
+
+
+class CrawlCheckpoint:
+    """
+    On-disk record of a crawl's frontier and visited state, kept in SQLite.
+
+    Every URL is written once when it is first queued and updated once when its page has
+    been crawled, so the pending frontier is simply the queued rows not yet visited.
+    Writes are buffered and committed in one transaction every `batch_size` records or
+    `interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, path, batch_size=500, interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE NOT NULL,
+                visited INTEGER NOT NULL DEFAULT 0,
+                matched INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self.queued = []
+        self.visited = []
+        self.last_flush = time.monotonic()
+
+    def start(self, base_url, url_path, resume=False):
+        """
+        Prepare the checkpoint for a crawl of base_url, clearing it unless resuming.
+
+        Raises:
+            ValueError: If resuming a checkpoint that was written for another crawl.
+        """
+        if resume:
+            meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+            if meta and (meta.get("base_url"), meta.get("url_path")) != (base_url, url_path):
+                raise ValueError(f"Checkpoint {self.path} belongs to a crawl of {meta.get('base_url')} with path {meta.get('url_path')!r}.")
+        else:
+            with self.connection:
+                self.connection.execute("DELETE FROM urls")
+                self.connection.execute("DELETE FROM meta")
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("base_url", base_url), ("url_path", url_path)],
+            )
+
+    def load(self):
+        """
+        Return the saved crawl state.
+
+        Returns:
+            tuple: (visited URLs, pending URLs in queue order, matched URLs in queue order, finished flag).
+        """
+        rows = self.connection.execute("SELECT url, visited, matched FROM urls ORDER BY seq").fetchall()
+        visited = [url for url, was_visited, _ in rows if was_visited]
+        pending = [url for url, was_visited, _ in rows if not was_visited]
+        url_list = [url for url, was_visited, matched in rows if was_visited and matched]
+        finished = self.connection.execute("SELECT value FROM meta WHERE key = 'finished'").fetchone() is not None
+        return visited, pending, url_list, finished
+
+    def record_queued(self, url):
+        self.queued.append((url,))
+        self.maybe_flush()
+
+    def record_visited(self, url, matched):
+        self.visited.append((int(matched), url))
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if len(self.queued) + len(self.visited) >= self.batch_size or time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO urls (url) VALUES (?)", self.queued)
+            self.connection.executemany("UPDATE urls SET visited = 1, matched = ? WHERE url = ?", self.visited)
+        self.queued.clear()
+        self.visited.clear()
+        self.last_flush = time.monotonic()
+
+    def finish(self):
+        """Flush outstanding records and mark the crawl as complete."""
+        self.flush()
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('finished', '1')")
+
+    def close(self):
+        self.flush()
+        self.connection.close()
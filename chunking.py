@@ -0,0 +1,58 @@
+import re
+from collections import namedtuple
+
+# GLiNER counts its input length in words as split by this pattern (its whitespace token splitter)
+TOKEN_PATTERN = re.compile(r"\w+(?:[-_]\w+)*|\S")
+WORD_PATTERN = re.compile(r"\S+")
+
+# A piece of the source text, with its character offsets in that text
+Chunk = namedtuple("Chunk", ["text", "start", "end"])
+
+
+# Function to split text into chunks of at most max_tokens model tokens in one linear pass.
+# Chunks break between whitespace-separated words; with overlap > 0 each chunk repeats about
+# that many tokens from the end of the previous one so entities are not cut at a boundary.
+def chunk_text(text, max_tokens=384, overlap=0, token_pattern=TOKEN_PATTERN):
+    overlap = min(overlap, max_tokens - 1)
+    chunks = []
+    words = []  # (start, end, tokens) of the words in the current chunk
+    tokens = 0
+
+    for match in WORD_PATTERN.finditer(text):
+        word_tokens = len(token_pattern.findall(match.group(0))) or 1
+        if words and tokens + word_tokens > max_tokens:
+            chunks.append(Chunk(text[words[0][0]:words[-1][1]], words[0][0], words[-1][1]))
+
+            # Carry the last words over, as long as they fit the overlap and leave room for this word
+            carried = []
+            carried_tokens = 0
+            for word in reversed(words):
+                if carried_tokens + word[2] > overlap or carried_tokens + word[2] + word_tokens > max_tokens:
+                    break
+                carried.append(word)
+                carried_tokens += word[2]
+            words = carried[::-1]
+            tokens = carried_tokens
+
+        words.append((match.start(), match.end(), word_tokens))
+        tokens += word_tokens
+
+    if words:
+        chunks.append(Chunk(text[words[0][0]:words[-1][1]], words[0][0], words[-1][1]))
+    return chunks
+
+# Function to rebuild the source text covered by a list of chunks, counting overlapping parts once
+def document_text(chunks):
+    parts = []
+    position = None
+    for chunk in chunks:
+        if position is None:
+            parts.append(chunk.text)
+        elif chunk.start >= position:
+            parts.append(" " * (chunk.start - position) + chunk.text)
+        elif chunk.end > position:
+            parts.append(chunk.text[position - chunk.start:])
+        else:
+            continue
+        position = chunk.end
+    return "".join(parts)
@@ -0,0 +1,212 @@
+import json
+import os
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+
+# Function to create the folder a file is written to
+def make_parent(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+class CorpusGraph:
+    """
+    Entity co-occurrence graph of the whole corpus, built up one page at a time.
+
+    Pages and (entity, label) pairs each get an index, and the page-by-entity incidence
+    matrix A holds how often an entity occurs on a page. Adding a page only stores its
+    row of A, replacing the row it had if it comes back, so memory grows with the number
+    of (page, entity) pairs. The co-occurrence matrix C = AᵀA is computed with one sparse
+    product when the graph is read, and kept until another page is added.
+
+    With weighted=False an entity counts once per page it was found on, even with zero
+    occurrences (as for a demonym counted under its country), so an edge weight is the
+    number of pages two entities share; with weighted=True it is the sum of the products
+    of their occurrences. The occurrences themselves are kept either way, so a saved
+    graph can be loaded with the other weighting.
+    """
+
+    def __init__(self, weighted=False):
+        self.weighted = weighted
+        self.entities = {}  # (entity, label) -> index
+        self.entity_keys = []
+        self.pages = {}  # url -> index
+        self.page_urls = []
+        self.page_rows = {}  # page index -> (entity indices, values)
+        self.cooccurrence = None  # AᵀA as of the last read, None once a page has been added since
+
+    def entity_index(self, entity, label):
+        key = (entity, label)
+        if key not in self.entities:
+            self.entities[key] = len(self.entity_keys)
+            self.entity_keys.append(key)
+        return self.entities[key]
+
+    def add_page(self, url, entity_counts):
+        """
+        Add or replace the entities of one page.
+
+        Args:
+            url (str): The page.
+            entity_counts (iterable): ((entity, label), occurrences) pairs, like count_entities returns.
+        """
+        if url not in self.pages:
+            self.pages[url] = len(self.page_urls)
+            self.page_urls.append(url)
+        page = self.pages[url]
+
+        counts = {}
+        for (entity, label), occurrences in entity_counts:
+            index = self.entity_index(entity, label)
+            counts[index] = counts.get(index, 0) + int(occurrences)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        self.page_rows[page] = (indices, values)
+        self.cooccurrence = None
+
+    def add_rows(self, rows, pages=()):
+        """
+        Add rows of [link, entity, label, occurrences], as an OutputSink writes them; the rows of a page must come together.
+
+        Pages listed in `pages` without any rows are replaced by pages without entities.
+        """
+        by_page = {page: [] for page in pages}
+        for url, entity, label, occurrences in rows:
+            by_page.setdefault(url, []).append(((entity, label), occurrences))
+        for url, entity_counts in by_page.items():
+            self.add_page(url, entity_counts)
+
+    def matrix(self):
+        """Return the entity co-occurrence matrix, with every page added so far."""
+        if self.cooccurrence is None:
+            incidence = self.incidence()
+            self.cooccurrence = (incidence.T @ incidence).tocsr()
+            self.cooccurrence.eliminate_zeros()
+        return self.cooccurrence
+
+    def incidence(self, counts=False):
+        """Return the page-by-entity incidence matrix A, weighted like the edges, or holding the occurrences with counts=True."""
+        rows = [np.full(len(indices), page) for page, (indices, _) in self.page_rows.items()]
+        columns = [indices for indices, _ in self.page_rows.values()]
+        values = [values for _, values in self.page_rows.values()]
+        if not rows:
+            return sparse.csr_matrix((len(self.page_urls), len(self.entity_keys)))
+        values = np.concatenate(values)
+        if not counts and not self.weighted:
+            # Every stored (page, entity) pair is present, whatever its occurrences
+            values = np.ones_like(values)
+        return sparse.csr_matrix(
+            (values, (np.concatenate(rows), np.concatenate(columns))),
+            shape=(len(self.page_urls), len(self.entity_keys)),
+        )
+
+    def page_counts(self):
+        """Return the number of pages every entity was found on."""
+        columns = [indices for indices, _ in self.page_rows.values()]
+        if not columns:
+            return np.zeros(len(self.entity_keys), dtype=np.int64)
+        return np.bincount(np.concatenate(columns), minlength=len(self.entity_keys))
+
+    def page_links(self, min_weight=1):
+        """Return (url, url, weight) for pages sharing entities, weighted like the entity edges."""
+        incidence = self.incidence()
+        links = sparse.triu(incidence @ incidence.T, k=1).tocoo()
+        keep = links.data >= min_weight
+        return [(self.page_urls[i], self.page_urls[j], float(w)) for i, j, w in zip(links.row[keep], links.col[keep], links.data[keep])]
+
+    def edges(self, min_weight=1, top_k=None):
+        """
+        Return the pruned co-occurrence edges as (source index, target index, weight) arrays.
+
+        Edges lighter than min_weight are dropped. With top_k, an edge is kept only if it
+        is among the top_k heaviest edges of at least one of its two entities.
+        """
+        matrix = self.matrix().copy()
+        matrix.setdiag(0)
+        matrix.eliminate_zeros()
+        matrix.data[matrix.data < min_weight] = 0
+        matrix.eliminate_zeros()
+
+        if top_k is not None:
+            kept = np.zeros(matrix.nnz, dtype=bool)
+            for row in range(matrix.shape[0]):
+                start, end = matrix.indptr[row], matrix.indptr[row + 1]
+                if end - start <= top_k:
+                    kept[start:end] = True
+                else:
+                    kept[start + np.argpartition(-matrix.data[start:end], top_k - 1)[:top_k]] = True
+            chosen = sparse.csr_matrix((kept.astype(np.int8), matrix.indices, matrix.indptr), shape=matrix.shape)
+            chosen = chosen.maximum(chosen.T)  # Kept by either end
+            matrix = matrix.multiply(chosen).tocsr()
+
+        upper = sparse.triu(matrix, k=1).tocoo()
+        return upper.row, upper.col, upper.data
+
+    def to_networkx(self, min_weight=1, top_k=None):
+        """Return the pruned graph, with the label and page count of every entity; entities left without edges are dropped."""
+        pages = self.page_counts()
+        graph = nx.Graph()
+        for index, (entity, label) in enumerate(self.entity_keys):
+            graph.add_node(index, label=str(entity), type=label, pages=int(pages[index]))
+        sources, targets, weights = self.edges(min_weight, top_k)
+        graph.add_weighted_edges_from(zip(sources.tolist(), targets.tolist(), weights.tolist()))
+        graph.remove_nodes_from([node for node in list(graph) if graph.degree(node) == 0])
+        return graph
+
+    def export(self, prefix, min_weight=1, top_k=None, formats=("gexf", "graphml", "parquet")):
+        """Write the pruned graph to prefix.gexf, prefix.graphml and prefix_edges.parquet."""
+        make_parent(prefix)
+        written = []
+        if "gexf" in formats or "graphml" in formats:
+            graph = self.to_networkx(min_weight, top_k)
+            if "gexf" in formats:
+                nx.write_gexf(graph, f"{prefix}.gexf")
+                written.append(f"{prefix}.gexf")
+            if "graphml" in formats:
+                nx.write_graphml(graph, f"{prefix}.graphml")
+                written.append(f"{prefix}.graphml")
+        if "parquet" in formats:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            sources, targets, weights = self.edges(min_weight, top_k)
+            table = pa.table({
+                "source": [str(self.entity_keys[i][0]) for i in sources],
+                "source_label": [self.entity_keys[i][1] for i in sources],
+                "target": [str(self.entity_keys[i][0]) for i in targets],
+                "target_label": [self.entity_keys[i][1] for i in targets],
+                "weight": pa.array(weights, type=pa.float64()),
+            })
+            pq.write_table(table, f"{prefix}_edges.parquet", compression="zstd")
+            written.append(f"{prefix}_edges.parquet")
+        return written
+
+    def save(self, path):
+        """Save the occurrences of every page, so a later run can keep adding pages without the corpus being read again."""
+        make_parent(path)
+        sparse.save_npz(path, self.incidence(counts=True))
+        with open(f"{path}.json", mode='w', encoding='utf-8') as file:
+            json.dump({"pages": self.page_urls, "entities": self.entity_keys}, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, weighted=False):
+        """Load a graph saved with save, weighing its edges as asked, whatever weighting it was saved with."""
+        with open(f"{path}.json", mode='r', encoding='utf-8') as file:
+            meta = json.load(file)
+        graph = cls(weighted)
+        graph.page_urls = meta["pages"]
+        graph.pages = {url: index for index, url in enumerate(graph.page_urls)}
+        graph.entity_keys = [tuple(key) for key in meta["entities"]]
+        graph.entities = {key: index for index, key in enumerate(graph.entity_keys)}
+        incidence = sparse.load_npz(path).tocsr()
+        for page in range(incidence.shape[0]):
+            start, end = incidence.indptr[page], incidence.indptr[page + 1]
+            if end > start:
+                graph.page_rows[page] = (incidence.indices[start:end].astype(np.int64), incidence.data[start:end])
+        return graph
+
+    def stats(self):
+        return {"pages": len(self.page_urls), "entities": len(self.entity_keys), "pairs": int(self.matrix().nnz)}
@@ -11,41 +11,107 @@ function extractArtistName(url) {
     return name.replace(/_/g, ' ').trim();
 }
 
-// Function to process CSV file after upload
-function processCSV(file) {
+// Function to process the uploaded file: a graph index written by graph_index.py, or a raw CSV file
+function processFile(file) {
     const reader = new FileReader();
     reader.onload = function (event) {
-        const csvData = d3.csvParse(event.target.result);
-        initializeNetwork(csvData);
+        if (file.name.toLowerCase().endsWith(".json")) {
+            initializeNetwork(JSON.parse(event.target.result));
+        } else {
+            initializeNetwork(buildIndex(d3.csvParse(event.target.result)));
+        }
     };
     reader.readAsText(file);
 }
 
-// Function to initialize the network visualization
-function initializeNetwork(data) {
-    let allNodes = [];
-    let allLinks = [];
+// Function to build the index of one label from its [artist, entity, weight] links, as graph_index.py does
+function buildLayer(entities, links, artistCount) {
+    links.sort((a, b) => a[0] - b[0]); // Stable, so the links of each artist keep their order
+    const offsets = new Array(artistCount + 1).fill(0);
+    const entityDegree = new Array(entities.length).fill(0);
+    const entityOccurrences = new Array(entities.length).fill(0);
+    links.forEach(([source, target, weight]) => {
+        offsets[source + 1]++;
+        entityDegree[target]++;
+        entityOccurrences[target] += weight;
+    });
+    for (let i = 0; i < artistCount; i++) {
+        offsets[i + 1] += offsets[i];
+    }
+    return {
+        entities: entities,
+        entity_degree: entityDegree,
+        entity_occurrences: entityOccurrences,
+        source: links.map(l => l[0]),
+        target: links.map(l => l[1]),
+        weight: links.map(l => l[2]),
+        offsets: offsets,
+        stats: { entities: entities.length, links: links.length }
+    };
+}
 
-    // Extract unique labels dynamically
-    const labels = [...new Set(data.map(d => d.Label))];
+// Function to build the graph index from the rows of a CSV file, in a single pass over the rows
+function buildIndex(data) {
+    const artistIndex = new Map();
+    const urls = [];
+    const labelRows = new Map();
+    data.forEach(row => {
+        if (!row.Link || !row.Entity || !row.Label) return;
+        if (!artistIndex.has(row.Link)) {
+            artistIndex.set(row.Link, urls.length);
+            urls.push(row.Link);
+        }
+        if (!labelRows.has(row.Label)) {
+            labelRows.set(row.Label, { entityIndex: new Map(), entities: [], links: [] });
+        }
+        const rows = labelRows.get(row.Label);
+        if (!rows.entityIndex.has(row.Entity)) {
+            rows.entityIndex.set(row.Entity, rows.entities.length);
+            rows.entities.push(row.Entity);
+        }
+        // A missing count weighs 1 as in graph_index.py, but a real 0 stays 0
+        const occurrences = row.Occurrences ? +row.Occurrences : NaN;
+        rows.links.push([artistIndex.get(row.Link), rows.entityIndex.get(row.Entity), Number.isNaN(occurrences) ? 1 : occurrences]);
+    });
 
-    // Extract unique entities based on labels
-    const entities = {};
-    labels.forEach(label => {
-        entities[label] = [...new Set(data.filter(d => d.Label === label).map(d => d.Entity))];
+    const layers = {};
+    labelRows.forEach((rows, label) => {
+        layers[label] = buildLayer(rows.entities, rows.links, urls.length);
     });
+    return {
+        artists: { ids: urls.map(extractArtistName), urls: urls },
+        labels: [...labelRows.keys()],
+        layers: layers
+    };
+}
 
-    const artists = [...new Set(data.map(d => d.Link))];
+// Function to initialize the network visualization from a graph index
+function initializeNetwork(index) {
+    const labels = index.labels;
 
     // Create initial nodes (Artists only at the beginning)
-    allNodes = artists.map(d => ({ id: extractArtistName(d), type: "Artist", url: d }));
-
-    // Create artist-entity links dynamically
-    allLinks = data.map(row => ({
-        source: extractArtistName(row.Link),
-        target: row.Entity,
-        type: row.Label
-    }));
+    const allNodes = index.artists.ids.map((id, i) => ({ id: id, type: "Artist", url: index.artists.urls[i], index: i }));
+
+    // Entity nodes and artist-entity links of each label, made from the index the first time the label is chosen
+    const layerNodes = {};
+    const layerLinks = {};
+
+    // Function to get the entity nodes and links of a label
+    function layer(label) {
+        if (!layerLinks[label]) {
+            const data = index.layers[label];
+            layerNodes[label] = data.entities.map((entity, i) => ({
+                id: entity, type: label, degree: data.entity_degree[i]
+            }));
+            layerLinks[label] = data.source.map((source, i) => ({
+                source: allNodes[source].id,
+                target: data.entities[data.target[i]],
+                type: label,
+                weight: data.weight[i]
+            }));
+        }
+        return { nodes: layerNodes[label], links: layerLinks[label] };
+    }
 
     // Get window size
     let { width, height } = getWindowSize();
@@ -85,18 +151,13 @@ function initializeNetwork(data) {
     function updateVisualization() {
         const filterEntity = document.getElementById("filter-type2").value;
 
-        let visibleNodes = [...allNodes];
+        let visibleNodes = allNodes;
         let visibleLinks = [];
 
         if (filterEntity !== "None") {
-            visibleLinks = allLinks.filter(l => l.type === filterEntity);
-
-            const entityIds = new Set(visibleLinks.map(l => l.target));
-            const relatedEntities = entities[filterEntity]
-                .filter(entity => entityIds.has(entity))
-                .map(entity => ({ id: entity, type: filterEntity }));
-
-            visibleNodes = [...allNodes, ...relatedEntities];
+            const selected = layer(filterEntity);
+            visibleLinks = selected.links;
+            visibleNodes = allNodes.concat(selected.nodes);
         }
 
         simulation.nodes(visibleNodes);
@@ -104,7 +165,7 @@ function initializeNetwork(data) {
         simulation.alpha(1).restart();
 
         link = link
-            .data(visibleLinks, d => `${d.source}-${d.target}`)
+            .data(visibleLinks, d => `${d.source.id}-${d.target.id}`)
             .join(
                 enter => enter.append("line")
                     .attr("stroke-width", 3),
@@ -177,12 +238,14 @@ function initializeNetwork(data) {
         const linkedTargets = new Set();
         linkedTargets.add(artistNode.id); // Keep the artist node visible
 
-        // Find all target nodes directly linked to the artist
-        allLinks.forEach(l => {
-            if (l.source.id === artistNode.id) {
-                linkedTargets.add(l.target.id);
+        // Find all target nodes directly linked to the artist, from its adjacency list in the selected label
+        const filterEntity = document.getElementById("filter-type2").value;
+        if (filterEntity !== "None") {
+            const data = index.layers[filterEntity];
+            for (let i = data.offsets[artistNode.index]; i < data.offsets[artistNode.index + 1]; i++) {
+                linkedTargets.add(data.entities[data.target[i]]);
             }
-        });
+        }
 
         // Hide all other artist nodes except the current artist and its targets
         d3.selectAll(".node-circle")
@@ -209,7 +272,7 @@ function initializeNetwork(data) {
     ["None", ...labels].forEach(type => {
         const option = document.createElement("option");
         option.value = type;
-        option.textContent = type;
+        option.textContent = type === "None" ? type : `${type} (${index.layers[type].stats.entities})`;
         relationDropdown.appendChild(option);
     });
 
@@ -221,6 +284,6 @@ function initializeNetwork(data) {
 document.getElementById("file-upload").addEventListener("change", function (event) {
     const file = event.target.files[0];
     if (file) {
-        processCSV(file);
+        processFile(file);
     }
 });
@@ -0,0 +1,209 @@
+import argparse
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+
+class EntityStore:
+    """
+    SQLite database of the entities found on every page.
+
+    Pages, labels and entities each get a row of their own and `occurrences` links them,
+    holding how often an entity of a label occurs on a page. Entity text and label are
+    indexed, so corpus-wide questions are answered by the database instead of by
+    re-reading CSV files. The database runs in WAL mode, so it can be queried while a
+    scrape is writing to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                url TEXT UNIQUE NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS labels (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entities (
+                id INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                label_id INTEGER NOT NULL REFERENCES labels (id),
+                UNIQUE (text, label_id)
+            );
+            CREATE TABLE IF NOT EXISTS occurrences (
+                page_id INTEGER NOT NULL REFERENCES pages (id) ON DELETE CASCADE,
+                entity_id INTEGER NOT NULL REFERENCES entities (id),
+                count INTEGER NOT NULL,
+                PRIMARY KEY (page_id, entity_id)
+            );
+            CREATE INDEX IF NOT EXISTS entities_label ON entities (label_id);
+            CREATE INDEX IF NOT EXISTS occurrences_entity ON occurrences (entity_id);
+            """
+        )
+
+    def add_rows(self, rows, pages=()):
+        """
+        Save rows of [link, entity, label, occurrences] in one transaction.
+
+        The rows of a page replace everything stored for that page before, so a page must
+        not be split between two calls. Pages listed in `pages` are replaced too, so a page
+        where no entities were found is stored with none.
+        """
+        now = time.time()
+        pages = list(dict.fromkeys([*pages, *(row[0] for row in rows)]))
+        labels = list(dict.fromkeys(row[2] for row in rows))
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO pages (url, updated_at) VALUES (?, ?) ON CONFLICT(url) DO UPDATE SET updated_at = excluded.updated_at",
+                [(url, now) for url in pages],
+            )
+            self.connection.executemany("INSERT OR IGNORE INTO labels (name) VALUES (?)", [(label,) for label in labels])
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO entities (text, label_id) SELECT ?, id FROM labels WHERE name = ?",
+                list(dict.fromkeys((entity, label) for _, entity, label, _ in rows)),
+            )
+            self.connection.executemany(
+                "DELETE FROM occurrences WHERE page_id = (SELECT id FROM pages WHERE url = ?)", [(url,) for url in pages],
+            )
+            self.connection.executemany(
+                """
+                INSERT INTO occurrences (page_id, entity_id, count)
+                SELECT pages.id, entities.id, ? FROM pages, entities JOIN labels ON labels.id = entities.label_id
+                WHERE pages.url = ? AND entities.text = ? AND labels.name = ?
+                ON CONFLICT(page_id, entity_id) DO UPDATE SET count = excluded.count
+                """,
+                [(int(count), url, entity, label) for url, entity, label, count in rows],
+            )
+
+    def has_page(self, url):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM pages WHERE url = ?", (url,)).fetchone() is not None
+
+    def page_rows(self, url):
+        """Return the rows saved for a page as [link, entity, label, occurrences], sorted like the page CSV."""
+        with self.lock:
+            rows = self.connection.execute(
+                """
+                SELECT pages.url, entities.text, labels.name, occurrences.count
+                FROM occurrences
+                JOIN pages ON pages.id = occurrences.page_id
+                JOIN entities ON entities.id = occurrences.entity_id
+                JOIN labels ON labels.id = entities.label_id
+                WHERE pages.url = ?
+                ORDER BY entities.text, labels.name
+                """,
+                (url,),
+            ).fetchall()
+        return [list(row) for row in rows]
+
+    def frame(self, url=None, label=None):
+        """
+        Return entity rows as a DataFrame with the columns of all_entities.csv.
+
+        Args:
+            url (str): Only the rows of this page, if given.
+            label (str): Only the rows of this label, if given.
+        """
+        query = """
+            SELECT pages.url AS Link, entities.text AS Entity, labels.name AS Label, occurrences.count AS Occurrences
+            FROM occurrences
+            JOIN pages ON pages.id = occurrences.page_id
+            JOIN entities ON entities.id = occurrences.entity_id
+            JOIN labels ON labels.id = entities.label_id
+            WHERE (:url IS NULL OR pages.url = :url) AND (:label IS NULL OR labels.name = :label)
+            ORDER BY pages.id, entities.text, labels.name
+        """
+        with self.lock:
+            return pd.read_sql_query(query, self.connection, params={"url": url, "label": label})
+
+    def frequencies(self, url=None, label=None, limit=None):
+        """Return (entity, total occurrences) pairs, most frequent first, for a page or the whole corpus."""
+        query = """
+            SELECT entities.text, SUM(occurrences.count) AS total
+            FROM occurrences
+            JOIN pages ON pages.id = occurrences.page_id
+            JOIN entities ON entities.id = occurrences.entity_id
+            JOIN labels ON labels.id = entities.label_id
+            WHERE (:url IS NULL OR pages.url = :url) AND (:label IS NULL OR labels.name = :label)
+            GROUP BY entities.text
+            ORDER BY total DESC, entities.text
+            LIMIT :limit
+        """
+        with self.lock:
+            return self.connection.execute(query, {"url": url, "label": label, "limit": limit if limit else -1}).fetchall()
+
+    def pages_mentioning(self, entity, label=None):
+        """Return (url, occurrences) of the pages an entity was found on, most mentions first."""
+        query = """
+            SELECT pages.url, SUM(occurrences.count) AS total
+            FROM entities
+            JOIN labels ON labels.id = entities.label_id
+            JOIN occurrences ON occurrences.entity_id = entities.id
+            JOIN pages ON pages.id = occurrences.page_id
+            WHERE entities.text = :entity AND (:label IS NULL OR labels.name = :label)
+            GROUP BY pages.url
+            ORDER BY total DESC, pages.url
+        """
+        with self.lock:
+            return self.connection.execute(query, {"entity": entity, "label": label}).fetchall()
+
+    def stats(self):
+        with self.lock:
+            return {
+                table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("pages", "labels", "entities", "occurrences")
+            }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the entity store written by main.py --entity-store.")
+    parser.add_argument("store", help="Entity store database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    mentions = subparsers.add_parser("mentions", help="List the pages an entity was found on")
+    mentions.add_argument("entity")
+    mentions.add_argument("--label")
+    top = subparsers.add_parser("top", help="List the most frequent entities")
+    top.add_argument("--label")
+    top.add_argument("--url")
+    top.add_argument("--limit", type=int, default=20)
+    cloud = subparsers.add_parser("wordcloud", help="Draw a word cloud of a page or of the whole corpus")
+    cloud.add_argument("output", help="PNG file to write")
+    cloud.add_argument("--label")
+    cloud.add_argument("--url")
+    graph = subparsers.add_parser("graphs", help="Draw the label graphs of a page or of the whole corpus")
+    graph.add_argument("output", help="Folder the graphs are written to")
+    graph.add_argument("--url")
+    subparsers.add_parser("stats", help="Count the rows of every table")
+    args = parser.parse_args()
+
+    store = EntityStore(args.store)
+    if args.command == "mentions":
+        for url, total in store.pages_mentioning(args.entity, args.label):
+            print(f"{total}\t{url}")
+    elif args.command == "top":
+        for entity, total in store.frequencies(args.url, args.label, args.limit):
+            print(f"{total}\t{entity}")
+    elif args.command == "wordcloud":
+        from finalWordCloud import render_word_cloud
+        render_word_cloud(store.frequencies(args.url, args.label), args.url or args.store, args.output)
+    elif args.command == "graphs":
+        from graphs import generate_graphs_from_frame
+        generate_graphs_from_frame(store.frame(args.url), args.output)
+    else:
+        print(store.stats())
+    store.close()
@@ -0,0 +1,158 @@
+import codecs
+import json
+import os
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from lxml import etree, html
+
+# Elements whose text is never part of the page content
+NON_CONTENT_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "object", "canvas"}
+FEED_SIZE = 64 * 1024
+
+
+class PhraseTarget:
+    """
+    lxml parser target that collects the text between a start and an end phrase.
+
+    Text inside non-content elements is skipped and every tag boundary becomes a space,
+    as the old tag-stripping regex did. Text before the start phrase is dropped as soon as
+    it can no longer be part of a match, so memory is bounded by the extracted section.
+    """
+
+    def __init__(self, start_phrase, end_phrase):
+        self.start_phrase = start_phrase
+        self.end_phrase = end_phrase
+        self.skip_depth = 0
+        self.parts = []
+        self.text = ""
+        self.start_index = -1
+        self.end_index = -1
+        self.searched = 0
+
+    def start(self, tag, attrib):
+        if tag in NON_CONTENT_TAGS:
+            self.skip_depth += 1
+        self.parts.append(" ")
+
+    def end(self, tag):
+        if tag in NON_CONTENT_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        self.parts.append(" ")
+
+    def data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def comment(self, text):
+        self.parts.append(" ")
+
+    def close(self):
+        return None
+
+    @property
+    def done(self):
+        return self.end_index != -1
+
+    def search(self):
+        """Look for the phrases in the text received since the last call."""
+        if not self.parts:
+            return
+        self.text += "".join(self.parts)
+        self.parts = []
+
+        if self.start_index == -1:
+            self.start_index = self.text.find(self.start_phrase, self.searched)
+            if self.start_index == -1:
+                # Keep only the tail that could still hold the beginning of the start phrase
+                keep = max(0, len(self.text) - len(self.start_phrase) + 1)
+                self.text = self.text[keep:]
+                self.searched = 0
+                return
+            self.text = self.text[self.start_index:]
+            self.start_index = 0
+            self.searched = 0
+
+        self.end_index = self.text.find(self.end_phrase, max(self.searched, self.start_index))
+        self.searched = max(0, len(self.text) - len(self.end_phrase) + 1)
+
+    def result(self):
+        if self.start_index == -1 or self.end_index == -1:
+            return None
+        return self.text[self.start_index:self.end_index].strip()
+
+
+# Function to find the charset declared in a Content-Type header
+def charset_of(headers):
+    content_type = headers.get("Content-Type", "") if headers else ""
+    if "charset=" in content_type:
+        charset = content_type.split("charset=")[-1].split(";")[0].strip().strip('"')
+        try:
+            codecs.lookup(charset)
+            return charset
+        except LookupError:
+            pass
+    return "utf-8"
+
+# Function to extract the text between start_phrase and end_phrase, feeding the page to the parser
+# in pieces and stopping as soon as end_phrase has been seen. Returns None if a phrase is missing.
+def extract_between_phrases(body, start_phrase, end_phrase, encoding="utf-8"):
+    target = PhraseTarget(start_phrase, end_phrase)
+    parser = etree.HTMLParser(target=target, no_network=True)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    for offset in range(0, len(body), FEED_SIZE):
+        parser.feed(decoder.decode(body[offset:offset + FEED_SIZE]))
+        target.search()
+        if target.done:
+            return target.result()
+
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    target.search()
+    return target.result()
+
+# Function to load the per-site extraction templates, keyed by host name
+@lru_cache(maxsize=None)
+def load_templates(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, mode='r', encoding='utf-8') as file:
+        return json.load(file)
+
+# Function to find the template for a URL's host, if there is one
+def template_for(url, templates):
+    if not templates:
+        return None
+    host = urlsplit(url).hostname or ""
+    return templates.get(host)
+
+# Function to compile a template's CSS or XPath selector once and reuse it
+@lru_cache(maxsize=None)
+def compile_selector(kind, selector):
+    if kind == "css":
+        from lxml.cssselect import CSSSelector  # Needs the optional cssselect package
+        return CSSSelector(selector)
+    if kind == "xpath":
+        return etree.XPath(selector)
+    raise ValueError(f"Unknown template selector type: {kind}")
+
+# Function to extract the text of the elements a site template selects. Returns None if nothing matches.
+def extract_with_template(body, template, encoding="utf-8"):
+    kind = "css" if "css" in template else "xpath"
+    selector = compile_selector(kind, template[kind])
+
+    parser = html.HTMLParser(encoding=encoding, remove_comments=True, no_network=True)
+    document = html.document_fromstring(body, parser=parser)
+    etree.strip_elements(document, *NON_CONTENT_TAGS, with_tail=False)
+
+    texts = [" ".join(element.itertext()) for element in selector(document)]
+    text = " ".join(texts).strip()
+    return text or None
+
+# Function to extract the main content of a page with its site template if there is one, or between the phrases
+def extract_main_content(body, start_phrase, end_phrase, headers=None, template=None):
+    encoding = charset_of(headers)
+    if template:
+        return extract_with_template(body, template, encoding)
+    return extract_between_phrases(body, start_phrase, end_phrase, encoding)
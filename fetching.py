@@ -0,0 +1,280 @@
+import asyncio
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from throttling import rate_controller
+from warc import TRANSFER_HEADERS, WarcArchive, WarcWriter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 300  # Never wait longer than this on a single Retry-After header
+MAX_PAGE_BYTES = 5 * 1024 * 1024  # Default cap on the body kept of a page; the rest is not downloaded
+
+# WARC archive every fetched response is written to, and archive responses are read from instead of the network
+archive_writer = None
+replay_archive = None
+
+
+class Page(namedtuple("Page", ["url", "status", "headers", "body"])):
+    """A fetched HTTP response: final URL, status code, headers and raw body bytes."""
+
+    __slots__ = ()
+
+    @property
+    def text(self):
+        content_type = self.headers.get("Content-Type", "")
+        encoding = "utf-8"
+        if "charset=" in content_type:
+            encoding = content_type.split("charset=")[-1].split(";")[0].strip().strip('"') or encoding
+        try:
+            return self.body.decode(encoding, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+
+class PageBuffer:
+    """
+    Hands pages fetched by the crawler to the scraper so each page is downloaded once.
+
+    Bodies are kept in memory up to `max_memory` bytes in total; beyond that they are
+    spilled to files in a temporary directory. take() removes a page from the buffer.
+    """
+
+    def __init__(self, max_memory=64 * 1024 * 1024, spill_dir=None):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.memory_used = 0
+        self.pages = {}
+        self.spilled = 0
+        self.owns_spill_dir = False
+        self.lock = threading.Lock()
+
+    def put(self, url, page):
+        with self.lock:
+            if url in self.pages:
+                return
+            if self.memory_used + len(page.body) <= self.max_memory:
+                self.memory_used += len(page.body)
+                self.pages[url] = page
+                return
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix="page_buffer_")
+                self.owns_spill_dir = True
+            self.spilled += 1
+            path = os.path.join(self.spill_dir, f"page_{self.spilled}.html")
+        with open(path, mode='wb') as file:
+            file.write(page.body)
+        with self.lock:
+            self.pages[url] = page._replace(body=path)
+
+    def take(self, url):
+        """Remove and return the buffered page for a URL, or None if the crawler did not keep it."""
+        with self.lock:
+            page = self.pages.pop(url, None)
+            if page is not None and isinstance(page.body, bytes):
+                self.memory_used -= len(page.body)
+        if page is None or isinstance(page.body, bytes):
+            return page
+        with open(page.body, mode='rb') as file:
+            body = file.read()
+        os.remove(page.body)
+        return page._replace(body=body)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def close(self):
+        with self.lock:
+            for page in self.pages.values():
+                if isinstance(page.body, str) and os.path.exists(page.body):
+                    os.remove(page.body)
+            self.pages.clear()
+            self.memory_used = 0
+            if self.owns_spill_dir:
+                os.rmdir(self.spill_dir)
+                self.spill_dir = None
+                self.owns_spill_dir = False
+
+
+# Function to start writing every fetched response to a WARC file
+def record_to(path):
+    global archive_writer
+    archive_writer = WarcWriter(path)
+    return archive_writer
+
+# Function to serve every fetch from WARC files instead of the network
+def replay_from(paths):
+    global replay_archive
+    replay_archive = WarcArchive(paths)
+    print(f"Replaying {len(replay_archive)} archived pages.")
+    return replay_archive
+
+# Function to look up a URL in the replay archive; URLs that were never archived come back as 404
+def replayed_page(url):
+    archived = replay_archive.get(url)
+    if archived is None:
+        return Page(url, 404, CaseInsensitiveDict(), b"")
+    status, headers, body = archived
+    return Page(url, status, headers, body)
+
+# Function to wrap an in-memory Page in a requests.Response so it can be read like a streamed one
+def as_response(page):
+    response = requests.Response()
+    response.url = page.url
+    response.status_code = page.status
+    response.headers = CaseInsensitiveDict(page.headers)
+    response.raw = io.BytesIO(page.body)
+    return response
+
+# Function to read a Retry-After header given either in seconds or as an HTTP date
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(MAX_RETRY_AFTER, max(0.0, seconds))
+
+# Function to compute a full-jitter exponential backoff delay
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# Function to open a streamed response through the per-host throttle, retrying transient failures.
+# The caller must close the response. max_bytes caps the body read when it has to be read here, for the archive.
+def fetch_stream(url, session=None, controller=rate_controller, headers=None, max_retries=4, timeout=30, max_bytes=None):
+    if replay_archive is not None:
+        return as_response(replayed_page(url))
+    http = session or requests
+    throttle = controller.for_url(url)
+
+    for attempt in range(max_retries + 1):
+        throttle.acquire()
+        start = time.monotonic()
+        try:
+            response = http.get(url, headers=headers, timeout=timeout, stream=True)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            throttle.release(time.monotonic() - start, error=True)
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        except BaseException:
+            # Errors that are not retried, like too many redirects or a bad URL, still give the slot back
+            throttle.release(time.monotonic() - start, error=True)
+            raise
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        throttle.release(time.monotonic() - start, status=response.status_code, retry_after=retry_after)
+        if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+            if archive_writer is not None and response.status_code != 304:
+                # Archiving needs the whole body, so read it here and hand back an in-memory copy
+                with response:
+                    body = response.content if max_bytes is None else read_limited(response, max_bytes)
+                    page = Page(response.url, response.status_code, CaseInsensitiveDict(response.headers), body)
+                archive_writer.write(url, page)
+                return as_response(page._replace(headers=strip_transfer_headers(page.headers)))
+            return response
+        response.close()
+        # The throttle already holds the host until Retry-After has passed
+        if retry_after is None:
+            time.sleep(backoff_delay(attempt))
+
+# Function to drop the headers that describe how a body was transferred once it has been decoded
+def strip_transfer_headers(headers):
+    return CaseInsensitiveDict({name: value for name, value in headers.items() if name.lower() not in TRANSFER_HEADERS})
+
+# Function to add the conditional-request headers the cache holds for a URL
+def with_validators(url, headers, cache):
+    if cache is None:
+        return headers
+    return {**(headers or {}), **cache.conditional_headers(url)}
+
+# Function to read a streamed body, keeping at most max_bytes of it
+def read_limited(response, max_bytes):
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            print(f"Response from {response.url} is larger than {max_bytes} bytes, keeping the first {max_bytes}.")
+            break
+    return b"".join(chunks)[:max_bytes]
+
+# Coroutine version of read_limited for an aiohttp response
+async def read_limited_async(response, max_bytes):
+    chunks = []
+    size = 0
+    while True:
+        chunk = await response.content.read(64 * 1024)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            print(f"Response from {response.url} is larger than {max_bytes} bytes, keeping the first {max_bytes}.")
+            break
+    return b"".join(chunks)[:max_bytes]
+
+# Function to fetch a URL through the per-host throttle, retrying transient failures.
+# With an HttpCache the request is conditional and an unchanged page comes back with status 304.
+# With max_bytes, only that much of the body is downloaded.
+def fetch(url, session=None, controller=rate_controller, headers=None, max_retries=4, timeout=30, cache=None,
+          max_bytes=None):
+    with fetch_stream(url, session, controller, with_validators(url, headers, cache), max_retries, timeout, max_bytes) as response:
+        body = response.content if max_bytes is None else read_limited(response, max_bytes)
+        page = Page(response.url, response.status_code, CaseInsensitiveDict(response.headers), body)
+    if cache is not None and replay_archive is None:
+        page = cache.update(url, page)
+    return page
+
+# Coroutine version of fetch for the crawler's aiohttp session
+async def fetch_async(session, url, controller=rate_controller, headers=None, max_retries=4, timeout=30, cache=None,
+                      max_bytes=None):
+    if replay_archive is not None:
+        return replayed_page(url)
+    throttle = controller.for_url(url)
+    headers = with_validators(url, headers, cache)
+
+    for attempt in range(max_retries + 1):
+        await throttle.acquire_async()
+        start = time.monotonic()
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                body = await response.read() if max_bytes is None else await read_limited_async(response, max_bytes)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            throttle.release(time.monotonic() - start, error=True)
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        except BaseException:
+            # Other errors and cancellation are not retried, but still give the slot back
+            throttle.release(time.monotonic() - start, error=True)
+            raise
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        throttle.release(time.monotonic() - start, status=response.status, retry_after=retry_after)
+        if response.status not in RETRY_STATUSES or attempt == max_retries:
+            page = Page(str(response.url), response.status, CaseInsensitiveDict(response.headers), body)
+            if archive_writer is not None and page.status != 304:
+                archive_writer.write(url, page)
+            if cache is not None:
+                page = cache.update(url, page)
+            return page
+        if retry_after is None:
+            await asyncio.sleep(backoff_delay(attempt))
@@ -1,58 +1,172 @@
-import requests
+import asyncio
+import aiohttp
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from checkpoint import CrawlCheckpoint
+from fetching import MAX_PAGE_BYTES, fetch_async
+from frontier import Frontier, canonicalize_url
+from sitemaps import discover_from_sitemaps
 
 
-# Function to crawl a page and extract links
-def crawl_page(url, visited_urls, url_path):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-
-        soup = BeautifulSoup(response.content, "html.parser")
+# Function to extract the links of a fetched page that contain the specified path
+def extract_links(html, url, visited_urls, url_path):
+    soup = BeautifulSoup(html, "html.parser")
 
-        # Extract links and enqueue new URLs
-        links = []
-        for link in soup.find_all("a", href=True):
-            # Check if the link contains specified path and is not already visited
-            if url_path in link["href"] and link["href"] not in visited_urls:
-                next_url = urljoin(url, link["href"])
-                links.append(next_url)
+    links = []
+    for link in soup.find_all("a", href=True):
+        # Resolve the link so relative, fragment and query-order variants compare equal
+        next_url = canonicalize_url(link["href"], url)
+        if not next_url.startswith(("http://", "https://")):
+            continue
+        # Check if the link contains specified path and is not already visited
+        if url_path in next_url and next_url not in visited_urls:
+            links.append(next_url)
 
-        return links
+    return links
 
-    except requests.exceptions.RequestException as e:
+# Coroutine to fetch a page on the shared session and extract its links off the event loop
+async def crawl_page_async(session, url, visited_urls, url_path, cache=None, page_buffer=None, max_bytes=MAX_PAGE_BYTES):
+    try:
+        page = await fetch_async(session, url, cache=cache, max_bytes=max_bytes)
+        if page.status == 304:
+            # Unchanged page: reuse the links extracted on an earlier run
+            links = cache.links(url)
+            if links is not None:
+                return links
+            if not page.body:
+                page = await fetch_async(session, url, max_bytes=max_bytes)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"Error crawling {url}: {e}")
         return []
+    if page.status >= 400:
+        print(f"Error crawling {url}: status code {page.status}")
+        return []
+    if page_buffer is not None and page.status == 200 and is_target_url(url, url_path):
+        page_buffer.put(url, page)  # Hand the body to the scraper instead of fetching it again
+
+    if cache is not None:
+        visited_urls = ()  # Store every matching link so a later 304 can replay them all
+
+    # HTML parsing is CPU-bound, so run it in the default executor to keep the fetches going
+    loop = asyncio.get_running_loop()
+    links = await loop.run_in_executor(None, extract_links, page.body, url, visited_urls, url_path)
+    if cache is not None:
+        cache.store_links(url, links)
+    return links
 
-# Function to crawl and extract links from the website, and return bio URLs
-def crawl_and_extract_links(base_url, website_type, url_path):
-    visited_urls = set()  # Set to store visited URLs
-    urls_to_visit = [base_url]  # List to store URLs to visit next
+# Function to check whether a crawled URL is a bio page that should be returned
+def is_target_url(url, url_path):
+    if url_path not in url:
+        return False
+    return 'init=' not in url and 'default' not in url  # Skip URLs containing 'init=' or 'default'
+
+# Coroutine that keeps up to `concurrency` page fetches in flight over one pooled connection.
+# on_url, if given, is called with each bio URL once its page has been fetched, so processing can start during the crawl.
+# It may block while processing is behind, so it runs in the default executor: the fetches in flight carry on,
+# and no new fetch is started until the URL has been handed over.
+async def crawl_site(base_url, url_path, concurrency=10, frontier=None, checkpoint=None, resume=False, cache=None,
+                     page_buffer=None, on_url=None, max_bytes=MAX_PAGE_BYTES):
+    if frontier is None:
+        frontier = Frontier()  # Deduplicated queue of URLs to visit next
     url_list = []  # List to store URLs with specified path
-    '''if website_type == 1:
-        url_path = "/objects"
-    elif website_type == 2:
-        url_path = "/bios/Pages/"
-    '''
+    pending = {}  # Page fetches currently in flight, mapped to their URL
+    loop = asyncio.get_running_loop()
 
-    while urls_to_visit:
-        current_url = urls_to_visit.pop(0)  # Dequeue the first URL
+    if checkpoint is not None:
+        checkpoint.start(base_url, url_path, resume)
+    if resume and checkpoint is not None:
+        # Continue from the saved frontier without refetching visited pages
+        visited, queued, url_list, finished = checkpoint.load()
+        if on_url is not None:
+            for url in url_list:
+                await loop.run_in_executor(None, on_url, url)
+        if finished:
+            return url_list
+        for url in visited:
+            frontier.mark_seen(url)
+        frontier.extend(queued)
+        print(f"Resuming crawl: {len(visited)} pages visited, {len(queued)} pages queued.")
+    if frontier.push(base_url) and checkpoint is not None:
+        checkpoint.record_queued(canonicalize_url(base_url))
 
-        if current_url in visited_urls:
-            continue
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        while frontier or pending:
+            while frontier and len(pending) < concurrency:
+                current_url = frontier.pop()  # Dequeue the first URL
+
+                #print(f"Crawling: {current_url}")
+                task = asyncio.create_task(crawl_page_async(session, current_url, frontier, url_path, cache, page_buffer, max_bytes))
+                pending[task] = current_url
 
-        #print(f"Crawling: {current_url}")
+                # If the URL contains specified path, add it to the url_list
+                if is_target_url(current_url, url_path):
+                    url_list.append(current_url)
 
-        # Use the crawl_page function to get new links from the page
-        new_links = crawl_page(current_url, visited_urls,url_path)
-        visited_urls.add(current_url)
-        urls_to_visit.extend(new_links)
+            if not pending:
+                break
 
-        # If the URL contains specified path, add it to the url_list 
-        if url_path in current_url:
-            if 'init=' in current_url or 'default' in current_url:
-                continue  # Skip URLs containing 'init=' or 'default'
-            url_list.append(current_url)
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                current_url = pending.pop(task)
+                for link in task.result():
+                    if frontier.push(link) and checkpoint is not None:
+                        checkpoint.record_queued(link)
+                if checkpoint is not None:
+                    checkpoint.record_visited(current_url, is_target_url(current_url, url_path))
+                if on_url is not None and is_target_url(current_url, url_path):
+                    await loop.run_in_executor(None, on_url, current_url)
 
+    if checkpoint is not None:
+        checkpoint.finish()
     return url_list
+
+# Function to list bio URLs from the site's sitemaps, as (url, unchanged) pairs.
+# With skip_unchanged, a page whose lastmod is the one saved in lastmods is marked unchanged, so its saved results are reused.
+# Returns None if the site has no usable sitemap.
+def sitemap_links(base_url, url_path, lastmods=None, skip_unchanged=False):
+    entries = discover_from_sitemaps(base_url, url_path, is_target_url)
+    if not entries:
+        return None
+    print(f"Found {len(entries)} pages in the sitemaps.")
+
+    links = []
+    for url, lastmod in entries.items():
+        unchanged = False
+        if lastmods is not None:
+            unchanged = skip_unchanged and lastmods.unchanged(url, lastmod)
+            lastmods.expect(url, lastmod)  # Saved by lastmods.commit(url) once the page is processed
+        links.append((url, unchanged))
+    return links
+
+# Function to crawl and extract links from the website, and return bio URLs.
+# With discovery="auto" the sitemaps are used when the site has them and the pages are crawled otherwise.
+# on_url(url, unchanged) is called for sitemap pages, with unchanged set for pages skip_unchanged lets be reused.
+def crawl_and_extract_links(base_url, website_type, url_path, concurrency=10, frontier=None, checkpoint_path=None,
+                            resume=False, discovery="auto", lastmods=None, skip_unchanged=False, cache=None,
+                            page_buffer=None, on_url=None, max_bytes=MAX_PAGE_BYTES):
+    '''if website_type == 1:
+        url_path = "/objects"
+    elif website_type == 2:
+        url_path = "/bios/Pages/"
+    '''
+    if discovery in ("auto", "sitemap"):
+        links = sitemap_links(base_url, url_path, lastmods, skip_unchanged)
+        if links is not None:
+            if on_url is not None:
+                for url, unchanged in links:
+                    on_url(url, unchanged)
+            return [url for url, _ in links]
+        if discovery == "sitemap":
+            print("No pages found in the sitemaps.")
+            return []
+        print("No pages found in the sitemaps, crawling the website instead.")
+
+    checkpoint = CrawlCheckpoint(checkpoint_path) if checkpoint_path else None
+    try:
+        return asyncio.run(crawl_site(
+            base_url, url_path, concurrency=concurrency, frontier=frontier, checkpoint=checkpoint, resume=resume,
+            cache=cache, page_buffer=page_buffer, on_url=on_url, max_bytes=max_bytes,
+        ))
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
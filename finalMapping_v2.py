@@ -1,23 +1,82 @@
 import csv
+import os
+from functools import lru_cache
 
-def is_it_a_nationality(filename, query):
+
+class DemonymIndex:
+    """
+    Lookup tables built once from the countries and demonyms CSV file.
+
+    Demonyms are matched lower-cased, in one of four modes:
+        substring: the query appears anywhere in a demonym (what the scraper has always used)
+        prefix:    a demonym starts with the query
+        token:     the query is one whole word of a demonym
+        exact:     the query is a whole demonym
+    Every mode returns the English country of the first matching row of the file, with
+    the male demonym of a row checked before its female one. All tables are filled when
+    the index is built, so every lookup is a single dictionary access, and the index is
+    never changed afterwards, so it can be shared by threads and forked processes.
+    """
+
+    MODES = ("substring", "prefix", "token", "exact")
+
+    def __init__(self, filename):
+        self.tables = {mode: {} for mode in self.MODES}
+        self.arabic_countries = set()
+
+        with open(filename, mode='r', encoding='utf-8-sig') as file:
+            for row in csv.DictReader(file):
+                country = row['Country (English)']
+                for demonym in (row['Demonym (Male)'].lower(), row['Demonym (Female)'].lower()):
+                    # setdefault keeps the first row, as the row-by-row scan did
+                    for key in self.keys(demonym):
+                        self.tables["substring"].setdefault(key, country)
+                    for end in range(len(demonym) + 1):
+                        self.tables["prefix"].setdefault(demonym[:end], country)
+                    for token in demonym.split():
+                        self.tables["token"].setdefault(token, country)
+                    self.tables["exact"].setdefault(demonym, country)
+                self.arabic_countries.add(row.get('Country (Arabic)', '').strip())
+
+    @staticmethod
+    def keys(text):
+        """Every substring of text, including the empty one."""
+        return {text[start:end] for start in range(len(text) + 1) for end in range(start, len(text) + 1)}
+
+    def country_for(self, query, mode="substring"):
+        """Return the country whose demonym matches query, or False if there is none."""
+        return self.tables[mode].get(query.lower(), False)
+
+    def is_arabic_country(self, arabic_country):
+        return arabic_country.strip() in self.arabic_countries
+
+
+@lru_cache(maxsize=None)
+def load_index(filename):
+    """
+    Build the index for a CSV file the first time it is asked for and reuse it afterwards.
+
+    Args:
+        filename (str): The name of the CSV file.
+
+    Returns:
+        DemonymIndex: The index of the file.
+    """
+    return DemonymIndex(os.fspath(filename))
+
+def is_it_a_nationality(filename, query, mode="substring"):
     """
     Check if the provided query is a nationality (male or female) and return the country.
 
     Args:
         filename (str): The name of the CSV file.
         query (str): The query to check (case-insensitive).
+        mode (str): How the query is matched against the demonyms, see DemonymIndex.
 
     Returns:
-        str: The country if the query is a nationality, otherwise 'False'.
+        str: The country if the query is a nationality, otherwise False.
     """
-    with open(filename, mode='r', encoding='utf-8-sig') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if (query.lower() in row['Demonym (Male)'].lower() or
-                query.lower() in row['Demonym (Female)'].lower()):
-                return row['Country (English)']
-    return False
+    return load_index(filename).country_for(query, mode)
 
 def is_arabic_country(filename, arabic_country):
     """
@@ -30,9 +89,4 @@ def is_arabic_country(filename, arabic_country):
     Returns:
         bool: True if the Arabic country is found, False otherwise.
     """
-    with open(filename, mode='r', encoding='utf-8-sig') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if arabic_country.strip() == row.get('Country (Arabic)', '').strip():
-                return True
-    return False
\ No newline at end of file
+    return load_index(filename).is_arabic_country(arabic_country)
@@ -13,32 +13,51 @@ def is_arabic_text(text):
             return True
     return False
 
+# Read the entities and their frequencies from an entity CSV file
+def read_frequencies(csv_file):
+    frequencies = []
+    with open(csv_file, mode='r', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        next(reader)  # Skip the header row
+        for row in reader:
+            if len(row) < 4:  # Validate row length
+                print(f"Skipping invalid row: {row}")
+                continue
+            try:
+                frequencies.append((row[1].strip(), int(row[3])))  # The entity name and its frequency count
+            except ValueError:
+                print(f"Skipping invalid frequency value in row: {row}")
+                continue
+    return frequencies
+
 def generate_word_cloud(csv_file, title, save_path=None):
     try:
-        # Read the CSV file and create a dictionary of words and their frequencies
+        frequencies = read_frequencies(csv_file)
+        if not frequencies:
+            print(f"No valid data found in the file '{csv_file}'. No word cloud will be created.")
+            return None
+        render_word_cloud(frequencies, title, save_path)
+
+    except FileNotFoundError:
+        print(f"Error: The file '{csv_file}' was not found.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+# Draw a word cloud from (entity, frequency) pairs, e.g. the rows of a CSV file or an entity store query
+def render_word_cloud(frequencies, title, save_path=None):
+    try:
+        # Create a dictionary of words and their frequencies
         word_freq = {}
-        with open(csv_file, mode='r', encoding='utf-8-sig') as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip the header row
-            for row in reader:
-                if len(row) < 4:  # Validate row length
-                    print(f"Skipping invalid row: {row}")
-                    continue
-                try:
-                    entity = row[1].strip()  # The entity name
-                    if is_arabic_text(entity):  # Check if the text is Arabic
-                        reshaped_entity = arabic_reshaper.reshape(entity)  # Reshape for proper display
-                        bidi_entity = get_display(reshaped_entity)  # Adjust for RTL
-                    else:
-                        bidi_entity = entity  # Use the original text for non-Arabic entities
-                    frequency = int(row[3])  # The frequency count
-                    word_freq[bidi_entity] = frequency
-                except ValueError:
-                    print(f"Skipping invalid frequency value in row: {row}")
-                    continue
+        for entity, frequency in frequencies:
+            if is_arabic_text(entity):  # Check if the text is Arabic
+                reshaped_entity = arabic_reshaper.reshape(entity)  # Reshape for proper display
+                bidi_entity = get_display(reshaped_entity)  # Adjust for RTL
+            else:
+                bidi_entity = entity  # Use the original text for non-Arabic entities
+            word_freq[bidi_entity] = int(frequency)
 
         if not word_freq:
-            print(f"No valid data found in the file '{csv_file}'. No word cloud will be created.")
+            print("No entities to draw. No word cloud will be created.")
             return None
 
         # Dynamically select the font path
@@ -74,8 +93,6 @@ def generate_word_cloud(csv_file, title, save_path=None):
             plt.title(title, fontsize=10, loc='left', pad = 15) 
             plt.show()
 
-    except FileNotFoundError:
-        print(f"Error: The file '{csv_file}' was not found.")
     except PermissionError:
         print(f"Permission error: Unable to save the word cloud to '{save_path}'. Please check file permissions.")
     except Exception as e:
@@ -0,0 +1,164 @@
+import hashlib
+import heapq
+import math
+from collections import deque
+from itertools import count
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url, base_url=None):
+    """
+    Return the canonical form of a URL so that variants of the same page compare equal.
+
+    Relative URLs are resolved against base_url, the fragment is dropped, the scheme and
+    host are lower-cased, default ports are removed and the query parameters are sorted.
+
+    Args:
+        url (str): The URL or href to canonicalize.
+        base_url (str): The page the href was found on, if it may be relative.
+
+    Returns:
+        str: The canonical absolute URL.
+    """
+    url = url.strip()
+    if base_url:
+        url = urljoin(base_url, url)
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+
+    path = parts.path or "/"
+    # Sort the raw "key=value" pairs so that encoding is kept exactly as the site wrote it
+    query = "&".join(sorted(pair for pair in parts.query.split("&") if pair))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_fingerprint(url):
+    """Return a 64-bit fingerprint of a canonical URL."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over URL fingerprints.
+
+    The bit array is sized once from the expected capacity and false-positive rate,
+    so memory stays bounded however many URLs are added.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, fingerprint):
+        # Double hashing: derive k bit positions from two halves of the fingerprint
+        h1 = fingerprint & 0xFFFFFFFF
+        h2 = (fingerprint >> 32) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, fingerprint):
+        for position in self._positions(fingerprint):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, fingerprint):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+
+
+class SeenSet:
+    """
+    Set of seen URLs checked against a Bloom filter first.
+
+    A Bloom miss is a definite miss. A Bloom hit is confirmed against an exact set of
+    64-bit fingerprints, unless exact=False, in which case the Bloom filter alone decides
+    and memory is bounded by its bit array.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001, exact=True):
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.exact = set() if exact else None
+        self.count = 0
+
+    def __contains__(self, url):
+        fingerprint = url_fingerprint(url)
+        if fingerprint not in self.bloom:
+            return False
+        return self.exact is None or fingerprint in self.exact
+
+    def add(self, url):
+        """Add a URL, returning True if it had not been seen before."""
+        fingerprint = url_fingerprint(url)
+        if fingerprint in self.bloom and (self.exact is None or fingerprint in self.exact):
+            return False
+        self.bloom.add(fingerprint)
+        if self.exact is not None:
+            self.exact.add(fingerprint)
+        self.count += 1
+        return True
+
+    def __len__(self):
+        return self.count
+
+
+class Frontier:
+    """
+    Queue of URLs waiting to be crawled, deduplicated on their canonical form.
+
+    URLs are served first-in first-out from a deque, or lowest-priority-first from a heap
+    when a priority function is given. Every URL is marked seen when it is first pushed,
+    so it is queued at most once however many pages link to it.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001, exact=True, priority=None):
+        self.seen = SeenSet(capacity, error_rate, exact)
+        self.priority = priority
+        self.queue = [] if priority else deque()
+        self.order = count()
+        self.duplicates = 0
+
+    def push(self, url, base_url=None):
+        """Canonicalize and enqueue a URL, returning True if it was new."""
+        url = canonicalize_url(url, base_url)
+        if not self.seen.add(url):
+            self.duplicates += 1
+            return False
+        if self.priority:
+            heapq.heappush(self.queue, (self.priority(url), next(self.order), url))
+        else:
+            self.queue.append(url)
+        return True
+
+    def extend(self, urls, base_url=None):
+        """Push several URLs, returning the number that were new."""
+        return sum(self.push(url, base_url) for url in urls)
+
+    def mark_seen(self, url):
+        """Record a URL as seen without queueing it."""
+        self.seen.add(canonicalize_url(url))
+
+    def pop(self):
+        if self.priority:
+            return heapq.heappop(self.queue)[2]
+        return self.queue.popleft()
+
+    def __contains__(self, url):
+        return canonicalize_url(url) in self.seen
+
+    def __len__(self):
+        return len(self.queue)
+
+    def stats(self):
+        """Return the frontier size, the number of distinct URLs seen and the duplicate hits."""
+        return {"frontier_size": len(self.queue), "seen": len(self.seen), "duplicates": self.duplicates}
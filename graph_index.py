@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+INDEX_FORMAT = "museum-graph-index"
+INDEX_VERSION = 1
+
+
+# Function to extract the artist name from a bio URL, as extractArtistName in d3-tool/script.js does
+def artist_name(url):
+    if not url:
+        return "Unknown"
+    return url[url.rfind('/') + 1:].split('.')[0].replace('_', ' ').strip()
+
+# Function to build the index of one label from its rows, whose artists are given as indices
+def build_layer(artist_codes, entities, weights, artist_count):
+    """
+    Return the nodes, links, adjacency and degrees of one label.
+
+    Entities are numbered in first-appearance order. Links are sorted by artist, so the
+    links of artist i are source[offsets[i]:offsets[i + 1]] and the same offsets serve
+    as the artist adjacency lists.
+    """
+    entity_codes, entity_names = pd.factorize(entities, sort=False)
+    order = np.argsort(artist_codes, kind="stable")
+    source = artist_codes[order]
+    target = entity_codes[order]
+    weight = weights[order]
+
+    artist_degree = np.bincount(source, minlength=artist_count)
+    entity_degree = np.bincount(target, minlength=len(entity_names))
+    entity_occurrences = np.bincount(target, weights=weight, minlength=len(entity_names))
+    return {
+        "entities": [str(entity) for entity in entity_names],
+        "entity_degree": entity_degree.tolist(),
+        "entity_occurrences": entity_occurrences.astype(np.int64).tolist(),
+        "source": source.tolist(),
+        "target": target.tolist(),
+        "weight": weight.tolist(),
+        "offsets": np.concatenate(([0], np.cumsum(artist_degree))).tolist(),
+        "stats": {
+            "entities": len(entity_names),
+            "links": len(source),
+            "max_entity_degree": int(entity_degree.max()) if len(entity_degree) else 0,
+            "max_artist_degree": int(artist_degree.max()) if len(artist_degree) else 0,
+        },
+    }
+
+# Function to build the graph index of an entity DataFrame with the columns of all_entities.csv
+def build_graph_index(df):
+    """
+    Pre-aggregate the artist-entity graph the d3-tool draws.
+
+    The index holds every artist once, the labels in first-appearance order and, for
+    each label, its entities with their degrees and total occurrences, the links as
+    parallel integer arrays and the offsets of each artist's links. The browser then
+    only picks a label's arrays when a filter changes, instead of scanning every row.
+    """
+    df = df.dropna(subset=["Link", "Entity", "Label"])
+    artist_codes, urls = pd.factorize(df["Link"], sort=False)
+    weights = pd.to_numeric(df["Occurrences"], errors="coerce").fillna(1).astype(np.int64).to_numpy()
+    entities = df["Entity"].astype(str).to_numpy()
+    labels = pd.unique(df["Label"])
+
+    layers = {}
+    for label, positions in df.groupby("Label", sort=False).indices.items():
+        layers[str(label)] = build_layer(artist_codes[positions], entities[positions], weights[positions], len(urls))
+    return {
+        "format": INDEX_FORMAT,
+        "version": INDEX_VERSION,
+        "artists": {"ids": [artist_name(url) for url in urls], "urls": [str(url) for url in urls]},
+        "labels": [str(label) for label in labels],
+        "layers": layers,
+        "stats": {"artists": len(urls), "rows": len(df)},
+    }
+
+# Function to write the graph index of an entity file next to it, or to output_path
+def write_graph_index(file_path, output_path=None):
+    if file_path.endswith(".csv"):
+        df = pd.read_csv(file_path, encoding="utf-8-sig")
+    else:
+        from output_sink import load_corpus
+        df = load_corpus(file_path).to_pandas()
+    if output_path is None:
+        output_path = f"{os.path.splitext(file_path)[0]}_index.json"
+
+    index = build_graph_index(df)
+    with open(output_path, mode='w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False, separators=(',', ':'))
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-aggregate an entity file into the graph index loaded by d3-tool.")
+    parser.add_argument("input", help="all_entities.csv, or a Parquet/Arrow file written with --columnar")
+    parser.add_argument("-o", "--output", help="JSON file to write (default: <input>_index.json)")
+    args = parser.parse_args()
+    print(f"Graph index written to {write_graph_index(args.input, args.output)}")
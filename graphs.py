@@ -2,11 +2,12 @@ import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
 import os
+from functools import lru_cache
 import arabic_reshaper
 from bidi.algorithm import get_display
 from d3graph import d3graph, vec2adjmat
 
-def generate_graphs(file_path):    
+def generate_graphs(file_path, top_k=None):    
     # Load the CSV file
     df = pd.read_csv(file_path, encoding="utf-8-sig")
     
@@ -14,6 +15,53 @@ def generate_graphs(file_path):
     base_folder = os.path.dirname(file_path)
     file_name = os.path.splitext(os.path.basename(file_path))[0]
     output_folder = os.path.join(base_folder, f"{file_name}_graphs")
+    generate_graphs_from_frame(df, output_folder, top_k)
+
+# Define colors for each hub
+hub_colors = {
+    "Date": "lightblue",
+    "Person": "lightcoral",
+    "Place": "lightgreen",
+    "Country": "orange",
+    "Location": "gray"
+}
+
+WARM_START_NODES = 500  # Hub graphs this big start their layout from the last one drawn for the hub
+WARM_START_ITERATIONS = 20
+last_layouts = {}  # hub label -> positions of its last large layout
+
+# Function to reshape Arabic text for proper display; entities repeat across pages and hubs, so results are kept
+@lru_cache(maxsize=65536)
+def reshape_text(text):
+    try:
+        return get_display(arabic_reshaper.reshape(str(text)))
+    except Exception:
+        return str(text)
+
+# Function to compute the spring layout of a hub graph, reused when the same nodes and weights come back
+@lru_cache(maxsize=256)
+def hub_layout(hub_label, nodes, weights):
+    subgraph = nx.Graph()
+    subgraph.add_node(hub_label)
+    subgraph.add_nodes_from(nodes)
+    subgraph.add_weighted_edges_from((hub_label, node, weight) for node, weight in zip(nodes, weights))
+
+    if len(nodes) < WARM_START_NODES:
+        return nx.spring_layout(subgraph, seed=42)
+
+    # Large graphs start from where their nodes were last time and need fewer iterations
+    previous = last_layouts.get(hub_label, {})
+    initial = {node: previous[node] for node in subgraph if node in previous}
+    if initial:
+        pos = nx.spring_layout(subgraph, pos=initial, iterations=WARM_START_ITERATIONS, seed=42)
+    else:
+        pos = nx.spring_layout(subgraph, seed=42)
+    last_layouts[hub_label] = pos
+    return pos
+
+# Draw the label graphs of entity rows with the columns of all_entities.csv, e.g. from an entity store query.
+# With top_k, each label graph only shows the top_k entities with the most occurrences; the GEXF file keeps all.
+def generate_graphs_from_frame(df, output_folder, top_k=None):
     os.makedirs(output_folder, exist_ok=True)
     
     # Initialize a graph
@@ -26,63 +74,50 @@ def generate_graphs(file_path):
     for label in unique_labels:
         G.add_node(label, label="Hub", hub=True, type=label)
     
-    # Add individual nodes and connect to their hubs
-    for _, row in df.iterrows():
-        entity = row['Entity']
-        label = row['Label']
-        occurrences = row['Occurrences']
-    
-        # Add the entity as a node
-        G.add_node(entity, label=label, occurrences=occurrences, type=label)
-    
-        # Connect the entity to its corresponding hub
-        if G.has_edge(label, entity):
-            G[label][entity]["weight"] += occurrences
-        else:
-            G.add_edge(label, entity, weight=occurrences)
-    
-    # Define colors for each hub
-    hub_colors = {
-        "Date": "lightblue",
-        "Person": "lightcoral",
-        "Place": "lightgreen",
-        "Country": "orange",
-        "Location": "gray"
-    }
-    
-    # Function to reshape Arabic text for proper display
-    def reshape_text(text):
-        try:
-            return get_display(arabic_reshaper.reshape(str(text)))
-        except Exception:
-            return str(text)
+    # Add every entity once, in order of first appearance, with the attributes of its last row
+    entities = df['Entity'].drop_duplicates()
+    last_rows = df.drop_duplicates('Entity', keep='last').set_index('Entity').reindex(entities.tolist())
+    final_labels = last_rows['Label'].tolist()
+    G.add_nodes_from(
+        (entity, {"label": label, "occurrences": occurrences, "type": label})
+        for entity, label, occurrences in zip(entities.tolist(), final_labels, last_rows['Occurrences'].tolist())
+    )
+    
+    # Connect each entity to the hubs of its labels, weighted by its total occurrences under that label
+    weights = df.groupby(['Label', 'Entity'], sort=False, dropna=False)['Occurrences'].sum()
+    G.add_weighted_edges_from(
+        (label, entity, weight) for (label, entity), weight in zip(weights.index.tolist(), weights.tolist())
+    )
+    
+    # The nodes drawn in each hub graph: the entities whose last row has that label, in graph order
+    hub_nodes = {}
+    for entity, label in zip(entities.tolist(), final_labels):
+        hub_nodes.setdefault(label, []).append(entity)
     
     # Function to plot and save individual graphs for each entity
     def plot_entity_graph(hub_label, output_path):
+        nodes = hub_nodes.get(hub_label, [])
+        node_weights = [G[hub_label][node]['weight'] for node in nodes]
+        if top_k is not None and len(nodes) > top_k:
+            # Keep the heaviest entities, still in graph order
+            ranked = sorted(range(len(nodes)), key=lambda i: node_weights[i], reverse=True)[:top_k]
+            kept = sorted(ranked)
+            nodes = [nodes[i] for i in kept]
+            node_weights = [node_weights[i] for i in kept]
+    
         subgraph = nx.Graph()
     
-        # Add the hub node
+        # Add the hub node, then the nodes and edges for the current hub
         subgraph.add_node(hub_label, hub=True)
-    
-        # Add nodes and edges for the current hub
-        for node, attr in G.nodes(data=True):
-            if attr.get('label') == hub_label:
-                subgraph.add_node(node, **attr)
-                subgraph.add_edge(hub_label, node, weight=G[hub_label][node]['weight'])
+        subgraph.add_nodes_from(nodes)
+        subgraph.add_weighted_edges_from((hub_label, node, weight) for node, weight in zip(nodes, node_weights))
     
         # Define positions for nodes
-        pos = nx.spring_layout(subgraph, seed=42)
+        pos = hub_layout(hub_label, tuple(nodes), tuple(node_weights))
     
-        # Define colors and sizes for the subgraph nodes
-        node_colors = []
-        node_sizes = []
-        for node, attr in subgraph.nodes(data=True):
-            if attr.get('hub', False):
-                node_colors.append(hub_colors.get(hub_label, "gray"))
-                node_sizes.append(3000)  # Larger size for hub nodes
-            else:
-                node_colors.append(hub_colors.get(hub_label, "gray"))
-                node_sizes.append(2000)  # Standard size for individual nodes
+        # Define colors and sizes for the subgraph nodes; every node takes its hub's color
+        node_colors = [hub_colors.get(hub_label, "gray")] * (len(nodes) + 1)
+        node_sizes = [3000] + [2000] * len(nodes)  # Larger size for the hub node
     
         # Reshape labels for Arabic support
         labels = {node: reshape_text(node) for node in subgraph.nodes()}
@@ -117,10 +152,6 @@ def generate_graphs(file_path):
         G.nodes[node]['occurrences'] = attr.get('occurrences', 0)  # Frequency
         G.nodes[node]['type'] = 'Hub' if attr.get('hub', False) else attr.get('type', '')  # Entity type
     
-    # Add edge attributes
-    for u, v, attr in G.edges(data=True):
-        G[u][v]['weight'] = attr.get('weight', 1)
-    
     # Export to GEXF with attributes
     output_file = os.path.join(output_folder, "enhanced_graph_with_attributes.gexf")
     nx.write_gexf(G, output_file)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class NotModified(Exception):
+    """Raised when a page has not changed since it was last fetched and processed."""
+
+
+class HttpCache:
+    """
+    Local store of HTTP validators for conditional requests.
+
+    For every URL it keeps the ETag, the Last-Modified date and a hash of the body, plus
+    the links the crawler extracted from it. Requests for a known URL carry
+    If-None-Match/If-Modified-Since, and a 304 answer means the stored state is current.
+    A 200 whose body hashes to the stored value is reported as 304 too, which covers
+    servers that send no validators.
+
+    Rows are kept per scope, so the crawler and the scraper each see a page as changed
+    once even though they fetch it separately. The scraper checks pages with check and
+    only commits their validators once the page's entities are saved, so a page that
+    fails after being fetched is not taken as unchanged on the next run.
+    """
+
+    def __init__(self, path, scope="default"):
+        self.path = path
+        self.scope = scope
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                scope TEXT NOT NULL,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                links TEXT,
+                fetched_at REAL,
+                PRIMARY KEY (scope, url)
+            )
+            """
+        )
+        self.pending = {}  # url -> (etag, last_modified, body_hash) not yet committed
+        self.hits = 0
+        self.misses = 0
+
+    def conditional_headers(self, url):
+        with self.lock:
+            row = self.connection.execute("SELECT etag, last_modified FROM responses WHERE scope = ? AND url = ?", (self.scope, url)).fetchone()
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def check(self, url, page, conditional=True):
+        """
+        Return a fetched page, with status 304 if it is unchanged, and keep its validators until commit(url).
+
+        Args:
+            url (str): The requested URL.
+            page (Page): The response returned by the fetch layer.
+            conditional (bool): False if the results of the last fetch are gone, so the page
+                is never reported unchanged; its validators are still kept.
+        """
+        if page.status == 304:
+            with self.lock, self.connection:
+                self.hits += 1
+                self.connection.execute("UPDATE responses SET fetched_at = ? WHERE scope = ? AND url = ?", (time.time(), self.scope, url))
+            return page
+        if page.status != 200:
+            return page
+
+        body_hash = hashlib.sha256(page.body).hexdigest()
+        with self.lock:
+            row = self.connection.execute("SELECT body_hash FROM responses WHERE scope = ? AND url = ?", (self.scope, url)).fetchone()
+            self.pending[url] = (page.headers.get("ETag"), page.headers.get("Last-Modified"), body_hash)
+            if conditional and row is not None and row[0] == body_hash:
+                self.hits += 1
+                return page._replace(status=304)
+            self.misses += 1
+        return page
+
+    def commit(self, url):
+        """Save the validators kept by check for a URL, once its page has been processed."""
+        with self.lock, self.connection:
+            validators = self.pending.pop(url, None)
+            if validators is None:
+                return
+            self.connection.execute(
+                """
+                INSERT INTO responses (scope, url, etag, last_modified, body_hash, fetched_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(scope, url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified,
+                    body_hash = excluded.body_hash, fetched_at = excluded.fetched_at,
+                    links = CASE WHEN responses.body_hash = excluded.body_hash THEN responses.links END
+                """,
+                (self.scope, url, *validators, time.time()),
+            )
+
+    def discard(self, url):
+        """Forget the validators kept for a URL whose page could not be processed, so it is fetched in full next time."""
+        with self.lock:
+            self.pending.pop(url, None)
+
+    def update(self, url, page):
+        """Record the validators of a fetched page right away and return it, with status 304 if it is unchanged."""
+        page = self.check(url, page)
+        self.commit(url)
+        return page
+
+    def links(self, url):
+        """Return the links stored for a URL, or None if they were never stored."""
+        with self.lock:
+            row = self.connection.execute("SELECT links FROM responses WHERE scope = ? AND url = ?", (self.scope, url)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def store_links(self, url, links):
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE responses SET links = ? WHERE scope = ? AND url = ?", (json.dumps(links), self.scope, url))
+
+    def stats(self):
+        return {"not_modified": self.hits, "modified": self.misses}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+MODEL_NAME = "urchade/gliner_multi-v2.1"
+
+# Models loaded in this process, by name
+loaded_models = {}
+model_lock = threading.Lock()
+
+
+# Function to load a GLiNER model on first use and return the same instance afterwards
+def get_model(name=MODEL_NAME):
+    with model_lock:
+        if name not in loaded_models:
+            from gliner import GLiNER  # Imported here so that importing this module stays cheap
+            print(f"Loading {name}...")
+            loaded_models[name] = GLiNER.from_pretrained(name)
+        return loaded_models[name]
+
+
+class BatchPredictor:
+    """
+    Runs GLiNER predictions in batches gathered from any number of calling threads.
+
+    Chunks are grouped by label set and threshold, since one model call takes a single
+    pair of both. A group is sent to the model once it holds `batch_size` chunks or its
+    oldest chunk has waited `max_wait` seconds. Chunks are sorted by length before being
+    cut into batches, so texts of similar length are padded together. One worker
+    thread owns the model, so callers never run inference concurrently. With `in_flight`
+    above 1, that many batches are run at once, for models such as NerPool that take
+    calls from several threads, so the next batch is sent while the last one runs.
+
+    If no model is given, load_model() is called for it just before the first batch.
+    With a cache, chunks predicted before are answered from it and never queued.
+    """
+
+    def __init__(self, model=None, batch_size=8, max_wait=0.05, load_model=get_model, cache=None, in_flight=1):
+        self.model = model
+        self.load_model = load_model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.in_flight = in_flight
+        self.executor = None
+        self.slots = None  # Semaphore of the batches that may still be started
+        self.requests = queue.Queue()
+        self.groups = {}  # (labels, threshold) -> list of (text, future, submitted time)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.chunks = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                if self.in_flight > 1:
+                    self.executor = ThreadPoolExecutor(self.in_flight, thread_name_prefix="batch")
+                    self.slots = threading.BoundedSemaphore(self.in_flight)
+                self.thread = threading.Thread(target=self.run, name="batch-predictor", daemon=True)
+                self.thread.start()
+
+    def submit(self, texts, labels, threshold):
+        """Queue texts for prediction and return one Future per text."""
+        self.start()
+        cached = self.cache.get_many(texts, labels, threshold) if self.cache is not None else {}
+        futures = []
+        now = time.monotonic()
+        for i, text in enumerate(texts):
+            future = Future()
+            if i in cached:
+                future.set_result(cached[i])
+            else:
+                self.requests.put(((tuple(labels), threshold), text, future, now))
+            futures.append(future)
+        return futures
+
+    def predict(self, texts, labels, threshold):
+        """Predict entities for several texts, returning one list of entities per text."""
+        return [future.result() for future in self.submit(texts, labels, threshold)]
+
+    def run(self):
+        while True:
+            timeout = self.time_to_deadline()
+            try:
+                key, text, future, submitted = self.requests.get(timeout=timeout)
+                self.groups.setdefault(key, []).append((text, future, submitted))
+                # Take everything already waiting before deciding what to run
+                while True:
+                    key, text, future, submitted = self.requests.get_nowait()
+                    self.groups.setdefault(key, []).append((text, future, submitted))
+            except queue.Empty:
+                pass
+            self.run_ready_groups()
+
+    def time_to_deadline(self):
+        if not self.groups:
+            return None
+        oldest = min(items[0][2] for items in self.groups.values())
+        return max(0.0, oldest + self.max_wait - time.monotonic())
+
+    def run_ready_groups(self):
+        now = time.monotonic()
+        for key in list(self.groups):
+            items = self.groups[key]
+            expired = now - items[0][2] >= self.max_wait
+            if len(items) < self.batch_size and not expired:
+                continue
+
+            # Length-bucket the group; full batches run now, a partial batch waits unless expired
+            items.sort(key=lambda item: len(item[0]))
+            full = len(items) - len(items) % self.batch_size
+            ready, rest = (items, []) if expired else (items[:full], items[full:])
+            for start in range(0, len(ready), self.batch_size):
+                self.dispatch(key, ready[start:start + self.batch_size])
+            if rest:
+                self.groups[key] = sorted(rest, key=lambda item: item[2])
+            else:
+                del self.groups[key]
+
+    def dispatch(self, key, items):
+        if self.executor is None:
+            self.run_batch(key, items)
+            return
+        self.slots.acquire()  # Waits while `in_flight` batches are running
+        self.executor.submit(self.run_batch, key, items).add_done_callback(lambda _: self.slots.release())
+
+    def run_batch(self, key, items):
+        labels, threshold = key
+        texts = [text for text, _, _ in items]
+        try:
+            if self.model is None:
+                with self.lock:
+                    if self.model is None:
+                        self.model = self.load_model()
+            results = self.model.batch_predict_entities(texts, list(labels), threshold=threshold)
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+        if self.cache is not None:
+            self.cache.put_many(texts, labels, threshold, results)
+        with self.lock:
+            self.batches += 1
+            self.chunks += len(items)
+        for (_, future, _), entities in zip(items, results):
+            future.set_result(entities)
+
+    def stats(self):
+        return {"batches": self.batches, "chunks": self.chunks}
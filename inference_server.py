@@ -0,0 +1,118 @@
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from inference import MODEL_NAME, BatchPredictor
+from ner_backends import BACKENDS, ONNX_DIR, load_backend
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class RemoteModel:
+    """
+    Client for a running inference server, usable wherever a GLiNER model is.
+
+    Only the two prediction methods are forwarded; the server batches the texts of
+    every connected run together.
+    """
+
+    def __init__(self, url, timeout=300):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def batch_predict_entities(self, texts, labels, threshold=0.5, **kwargs):
+        response = self.session.post(
+            f"{self.url}/predict", json={"texts": list(texts), "labels": list(labels), "threshold": threshold},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["entities"]
+
+    def predict_entities(self, text, labels, threshold=0.5, **kwargs):
+        return self.batch_predict_entities([text], labels, threshold)[0]
+
+    def health(self):
+        response = self.session.get(f"{self.url}/health", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+# Function to build the request handler class around a shared predictor
+def make_handler(predictor, model_name):
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self.send_json(404, {"error": "not found"})
+                return
+            self.send_json(200, {"model": model_name, "loaded": predictor.model is not None, **predictor.stats()})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self.send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length))
+                texts, labels = request["texts"], request["labels"]
+                threshold = float(request.get("threshold", 0.5))
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {"error": f"bad request: {e}"})
+                return
+            try:
+                entities = predictor.predict(texts, labels, threshold)
+            except Exception as e:
+                self.send_json(500, {"error": str(e)})
+                return
+            self.send_json(200, {"entities": entities})
+
+        def log_message(self, format, *args):
+            pass  # One line per request would drown the useful output
+
+    return InferenceHandler
+
+
+# Function to keep a model loaded and serve predictions to other runs on this machine
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, model_name=MODEL_NAME, batch_size=8, max_wait=0.05, preload=True,
+          backend="torch", onnx_dir=ONNX_DIR, quantized=False):
+    predictor = BatchPredictor(
+        batch_size=batch_size, max_wait=max_wait, load_model=lambda: load_backend(backend, model_name, onnx_dir, quantized),
+    )
+    if preload:
+        predictor.model = predictor.load_model()
+    server = ThreadingHTTPServer((host, port), make_handler(predictor, model_name))
+    print(f"Serving {model_name} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(f"Inference stats: {predictor.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the GLiNER model loaded and serve predictions over local HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on; keep it on localhost")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--model", default=MODEL_NAME, help="GLiNER model to load")
+    parser.add_argument("--batch-size", type=int, default=8, help="Number of chunks sent to the model in one call")
+    parser.add_argument("--max-wait", type=float, default=0.05, help="Seconds a chunk may wait for its batch to fill up")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="torch", help="Run the model with PyTorch or ONNX Runtime")
+    parser.add_argument("--onnx-dir", default=ONNX_DIR, help="Folder of the exported ONNX model")
+    parser.add_argument("--quantized", action="store_true", help="Use the int8 quantized ONNX model")
+    parser.add_argument("--lazy", action="store_true", help="Load the model on the first request instead of at startup")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.model, args.batch_size, args.max_wait, preload=not args.lazy,
+          backend=args.backend, onnx_dir=args.onnx_dir, quantized=args.quantized)
@@ -0,0 +1,119 @@
+import re
+from collections import namedtuple
+
+from finalMapping_v2 import is_arabic_country, is_it_a_nationality
+
+COUNTRIES_FILE = 'countries_and_demonyms.csv'
+
+# Result lists an entity can be put in, in the order extract_entities returns them
+BUCKETS = ("human_names", "countries", "dates", "places", "cities")
+
+PRONOUNS = {"he", "she", "him", "her", "it", "they", "them", "we", "us", "i", "me", "you", "his", "their", "our"}
+ARABIC_PATTERN = re.compile(r'[\u0600-\u06FF]')
+YEAR_PATTERN = re.compile(r'\b(18|19|20)\d{2}\b')
+
+# How the entities of one label are kept: the bucket they go in and the normalizers they pass
+# through in order. A normalizer takes the entity text and returns the text to keep, or None to drop it.
+LabelRule = namedtuple("LabelRule", ["bucket", "normalizers"])
+
+# The labels and threshold GLiNER is run with for a kind of page, and the rule of each label
+Schema = namedtuple("Schema", ["labels", "threshold", "rules"])
+
+
+# Function to keep only text written in Arabic script
+def arabic_script(text):
+    return text if ARABIC_PATTERN.search(text) else None
+
+# Function to keep only capitalized names that are not pronouns
+def proper_name(text):
+    return text if text[:1].isupper() and text.lower() not in PRONOUNS else None
+
+# Function to turn a demonym into its country, keeping other text as it is
+def demonym_to_country(text):
+    return is_it_a_nationality(COUNTRIES_FILE, text) or text
+
+# Function to reduce a date to the year it contains
+def year(text):
+    match = YEAR_PATTERN.search(text)
+    return match.group(0) if match else None
+
+# Function to drop Arabic country names
+def not_a_country(text):
+    return None if is_arabic_country(COUNTRIES_FILE, text) else text
+
+
+SCHEMAS = {
+    # Collections in English
+    (1, "English"): Schema(["Human", "Country", "Date", "Era", "Material"], 0.5, {
+        "Human": LabelRule("human_names", (proper_name,)),
+        "Country": LabelRule("countries", (demonym_to_country,)),
+        "Date": LabelRule("dates", (year,)),
+        "Era": LabelRule("places", ()),
+        "Material": LabelRule("cities", ()),
+    }),
+    # Collections in Arabic; every label must be in Arabic script, dates too
+    (1, "Arabic"): Schema(["مادة", "عصر", "تاريخ", "دولة", "إنسان"], 0.6, {
+        "إنسان": LabelRule("human_names", (arabic_script,)),
+        "دولة": LabelRule("countries", (arabic_script,)),
+        "تاريخ": LabelRule("dates", (arabic_script, year)),
+        "عصر": LabelRule("places", (arabic_script,)),
+        "مادة": LabelRule("cities", (arabic_script, not_a_country)),
+    }),
+    # Encyclopedia in English
+    (2, "English"): Schema(["Person", "Place", "City", "Country", "Date"], 0.5, {
+        "Person": LabelRule("human_names", (proper_name,)),
+        "Country": LabelRule("countries", (demonym_to_country,)),
+        "Date": LabelRule("dates", (year,)),
+        "Place": LabelRule("places", ()),
+        "City": LabelRule("cities", ()),
+    }),
+    # Encyclopedia in Arabic
+    (2, "Arabic"): Schema(["مدينة", "مكان", "تاريخ", "دولة", "اسم"], 0.6, {
+        "اسم": LabelRule("human_names", (arabic_script,)),
+        "دولة": LabelRule("countries", (arabic_script,)),
+        "تاريخ": LabelRule("dates", (year,)),
+        "مكان": LabelRule("places", (arabic_script,)),
+        "مدينة": LabelRule("cities", (arabic_script, not_a_country)),
+    }),
+}
+
+
+# Function to add or replace the schema of a kind of page
+def register_schema(website_type, language, schema):
+    SCHEMAS[(website_type, language)] = schema
+
+# Function to get the schema of a kind of page
+def schema_for(website_type, language):
+    try:
+        return SCHEMAS[(website_type, language)]
+    except KeyError:
+        raise ValueError(f"No label schema for website type {website_type} in {language}.") from None
+
+# Function to sort the entities of a page into buckets with the schema's normalizers
+def apply_schema(schema, entities):
+    """
+    Normalize predicted entities and sort them into the result buckets.
+
+    The entities are grouped by label first and every distinct text of a label goes
+    through the label's normalizers once, however often the model found it.
+
+    Args:
+        schema (Schema): The schema of the page.
+        entities (list): Entity dicts as returned by GLiNER.
+
+    Returns:
+        dict: A set of (text, label) pairs for every bucket in BUCKETS.
+    """
+    texts_by_label = {}
+    for entity in entities:
+        texts_by_label.setdefault(entity["label"], set()).add(entity["text"].strip())
+
+    buckets = {bucket: set() for bucket in BUCKETS}
+    for label, texts in texts_by_label.items():
+        rule = schema.rules.get(label)
+        if rule is None:
+            continue
+        for normalizer in rule.normalizers:
+            texts = {normalizer(text) for text in texts} - {None}
+        buckets[rule.bucket].update((text, label) for text in texts)
+    return buckets
@@ -1,17 +1,95 @@
-import traceback
+import argparse
 #from scrapper_v2 import fetch_main_content_advanced, process_bio_page
 from finalCrawling import crawl_and_extract_links
-from scrapper_all import  fetch_main_content_advanced, process_bio_page
-import csv
+from corpus_graph import CorpusGraph
+from frontier import Frontier
+from graph_index import write_graph_index
+from entity_store import EntityStore
+from extraction import load_templates
+from fetching import MAX_PAGE_BYTES, PageBuffer, record_to, replay_from
+from httpcache import HttpCache
+from inference_server import RemoteModel
+from ner_backends import BACKENDS, ONNX_DIR, backend_model_id, load_backend
+from ner_cache import NerCache
+from ner_pool import NerPool
+from output_sink import OutputSink
+from pipeline import run_pipeline
+from rendering import MODES as RENDER_MODES, Renderer
+from scrapper_all import predictor
+from sitemaps import LastmodLog
+from throttling import rate_controller
+import os
 
 
 # Main script
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape museum pages and extract entities.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of pages fetched at the same time while crawling")
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="Requests per second sent to one host; this caps --concurrency when pages answer quickly")
+    parser.add_argument("--burst", type=int, default=5, help="Requests sent to one host in a burst before --rate applies")
+    parser.add_argument("--checkpoint", default="crawl_checkpoint.db", help="File where crawl progress is saved")
+    parser.add_argument("--resume", action="store_true", help="Continue the crawl saved in the checkpoint file")
+    parser.add_argument("--discovery", choices=["auto", "sitemap", "crawl"], default="auto",
+                        help="Find pages from robots.txt/sitemap.xml, by crawling, or from the sitemaps when the site has them")
+    parser.add_argument("--lastmod-file", default="sitemap_lastmod.json", help="File where sitemap lastmod values are kept between runs")
+    parser.add_argument("--skip-unchanged", action="store_true", help="Skip pages whose sitemap lastmod has not changed since the last run")
+    parser.add_argument("--http-cache", help="File of ETag/Last-Modified data used to skip pages unchanged since the last run")
+    parser.add_argument("--buffer-memory", type=int, default=64,
+                        help="Megabytes of crawled pages kept in memory for the scraper before spilling to disk")
+    parser.add_argument("--max-page-bytes", type=int, default=MAX_PAGE_BYTES,
+                        help="Bytes of a page downloaded at most; the rest of a larger page is not read")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="Number of threads fetching and cleaning bio pages")
+    parser.add_argument("--ner-workers", type=int,
+                        help="Number of pages whose entities are extracted at the same time; their chunks share model batches "
+                             "(default: 4, or 4 per NER process)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Number of chunks sent to the model in one call")
+    parser.add_argument("--max-wait", type=float, default=0.05, help="Seconds a chunk may wait for its batch to fill up")
+    parser.add_argument("--ner-server", help="URL of a running inference_server.py to use instead of loading the model here")
+    parser.add_argument("--ner-processes", type=int, default=1,
+                        help="Number of worker processes sharing one loaded model; 0 uses every core")
+    parser.add_argument("--ner-threads", type=int, help="Torch threads per worker process (default: cores / processes)")
+    parser.add_argument("--ner-backend", choices=list(BACKENDS), default="torch",
+                        help="Run the model with PyTorch or with ONNX Runtime (export it first with ner_backends.py export)")
+    parser.add_argument("--onnx-dir", default=ONNX_DIR, help="Folder of the exported ONNX model")
+    parser.add_argument("--onnx-quantized", action="store_true", help="Use the int8 quantized ONNX model")
+    parser.add_argument("--ner-cache", help="File where predictions are kept so chunks seen before are not predicted again")
+    parser.add_argument("--ner-cache-size", type=int, default=512, help="Megabytes of predictions kept in the NER cache")
+    parser.add_argument("--columnar", help="Parquet (.parquet) or Arrow IPC (.arrow) file all entities are also written to")
+    parser.add_argument("--no-page-files", action="store_true",
+                        help="Only write all_entities.csv, without the per-page CSV files, word clouds and graphs")
+    parser.add_argument("--entity-store", help="SQLite file all entities are saved to, queried with entity_store.py")
+    parser.add_argument("--render", choices=RENDER_MODES, default="pool",
+                        help="Draw word clouds and graphs in the pipeline (inline), in worker processes as pages are saved (pool), "
+                             "in worker processes at the end (end), only for all pages together (corpus), or not at all (off)")
+    parser.add_argument("--render-processes", type=int, help="Number of processes drawing word clouds and graphs (default: cores)")
+    parser.add_argument("--graph-top-k", type=int, help="Only draw the entities with the most occurrences in each label graph")
+    parser.add_argument("--corpus-graph", metavar="PREFIX",
+                        help="Build the entity co-occurrence graph of all pages and write PREFIX.gexf, PREFIX.graphml and "
+                             "PREFIX_edges.parquet; PREFIX.npz keeps it for the next run")
+    parser.add_argument("--cooccurrence-min-weight", type=float, default=1, help="Drop co-occurrence edges lighter than this")
+    parser.add_argument("--cooccurrence-neighbors", type=int, help="Keep only the heaviest co-occurrence edges of every entity")
+    parser.add_argument("--cooccurrence-weighted", action="store_true",
+                        help="Weigh co-occurrences by the occurrences on each page instead of counting shared pages")
+    parser.add_argument("--graph-index", action="store_true",
+                        help="Write all_entities_index.json, the pre-aggregated graph loaded by the d3-tool")
+    parser.add_argument("--flush-rows", type=int, default=5000, help="Number of entity rows collected before they are written out")
+    parser.add_argument("--queue-size", type=int, default=16, help="Number of pages allowed to wait between two stages")
+    parser.add_argument("--templates", help="JSON file of per-site CSS/XPath selectors used instead of the start and end phrases")
+    parser.add_argument("--archive", help="WARC file every fetched page is written to")
+    parser.add_argument("--replay", nargs="+", help="WARC files (or glob patterns) to read pages from instead of the network")
+    args = parser.parse_args()
+
+    rate_controller.configure(rate=args.rate, burst=args.burst)
+    if args.archive:
+        record_to(args.archive)
+    if args.replay:
+        replay_from(args.replay)
+
+    crawl_cache = HttpCache(args.http_cache, scope="crawl") if args.http_cache else None
+    http_cache = HttpCache(args.http_cache, scope="scrape") if args.http_cache else None
+
     website_type = input("Please choose the type of website:\n1. Collection\n2. Encyclopedia\nEnter the number corresponding to your choice: ").strip()
-    
-    with open("all_entities.csv", mode='w', newline='', encoding='utf-8-sig') as csv_file:
-        writer = csv.writer(csv_file)  # Pass the file object, not the string
-        writer.writerow(['Link', 'Entity', 'Label', 'Occurrences'])
 
 
     # Ensure website_type is an integer
@@ -23,13 +101,8 @@ if __name__ == "__main__":
 
     crawl_first = input("Do you want to crawl the whole website? yes/no: ").strip().lower()
     url = input("Enter the URL: ").strip()
-
     if crawl_first == 'yes':
         url_path = input("Enter specific path: ").strip()
-        url_list = crawl_and_extract_links(url, website_type, url_path)
-        print(f"Crawling finished. Found {len(url_list)} pages.")
-    elif crawl_first == 'no':  
-        url_list = [url]
 
     # Assign folder name based on website type
     if website_type == 1:
@@ -44,16 +117,88 @@ if __name__ == "__main__":
     start_phrase = input("Enter the starting phrase: ").strip()
     end_phrase = input("Enter the ending phrase: ").strip()
 
+    page_buffer = None
+    lastmods = LastmodLog(args.lastmod_file)
+    if crawl_first == 'yes':
+        frontier = Frontier()
+        page_buffer = PageBuffer(max_memory=args.buffer_memory * 1024 * 1024)
+
+        # Pages are processed as soon as the crawler finds them
+        def discover(emit):
+            url_list = crawl_and_extract_links(
+                url, website_type, url_path, concurrency=args.concurrency, frontier=frontier,
+                checkpoint_path=args.checkpoint, resume=args.resume, discovery=args.discovery,
+                lastmods=lastmods, skip_unchanged=args.skip_unchanged, cache=crawl_cache,
+                page_buffer=page_buffer, on_url=emit, max_bytes=args.max_page_bytes,
+            )
+            print(f"Crawling finished. Found {len(url_list)} pages.")
+            print(f"Frontier stats: {frontier.stats()}")
+    else:
+        def discover(emit):
+            emit(url)
+
+    predictor.batch_size = args.batch_size
+    predictor.max_wait = args.max_wait
+    predictor.load_model = lambda: load_backend(args.ner_backend, onnx_dir=args.onnx_dir, quantized=args.onnx_quantized)
+    ner_pool = None
+    ner_workers = args.ner_workers or 4
+    if args.ner_cache:
+        model_id = backend_model_id(args.ner_backend, quantized=args.onnx_quantized)
+        predictor.cache = NerCache(args.ner_cache, model_id, max_bytes=args.ner_cache_size * 1024 * 1024)
+    if args.ner_server:
+        predictor.model = RemoteModel(args.ner_server)
+    elif args.ner_processes != 1:
+        # Fork the workers now, before the pipeline starts any threads
+        ner_pool = NerPool(predictor.load_model(), args.ner_processes or None, args.ner_threads, slice_size=args.batch_size)
+        predictor.model = ner_pool
+        predictor.batch_size = args.batch_size * ner_pool.processes  # One slice for every worker
+        predictor.in_flight = 2  # Send the next batch to the workers while the last one is predicted
+        if args.ner_workers is None:
+            ner_workers = 4 * ner_pool.processes  # Enough pages to fill a batch for every worker
+
+    entity_store = EntityStore(args.entity_store) if args.entity_store else None
+    corpus_graph = None
+    if args.corpus_graph:
+        state_path = f"{args.corpus_graph}.npz"
+        if os.path.exists(state_path) and os.path.exists(f"{state_path}.json"):
+            # Pages seen again replace their old entities
+            corpus_graph = CorpusGraph.load(state_path, weighted=args.cooccurrence_weighted)
+        else:
+            corpus_graph = CorpusGraph(weighted=args.cooccurrence_weighted)
+    sink = OutputSink("all_entities.csv", args.columnar, batch_size=args.flush_rows, store=entity_store, graph=corpus_graph)
+    renderer = Renderer(args.render, args.render_processes, top_k=args.graph_top_k)
+
     # Process each bio page
-    for url_list in url_list:
-        try:
-            print(f"\nFetching content for {url_list}...")
-            chunks = fetch_main_content_advanced(url_list, start_phrase, end_phrase)
-            print("Content fetched successfully!")
-            #print(chunks)
-            #print("\nExtracting entities...")
-            process_bio_page(url_list, chunks, folder_name, website_type)
-
-        except Exception as e:
-            print(f"An error occurred while processing {url_list}: {e}")
-            traceback.print_exc()
+    run_pipeline(
+        discover, folder_name, website_type, start_phrase, end_phrase, fetch_workers=args.fetch_workers,
+        ner_workers=ner_workers, queue_size=args.queue_size, cache=http_cache, page_buffer=page_buffer,
+        templates=load_templates(args.templates), sink=sink, page_files=not args.no_page_files,
+        renderer=renderer, lastmods=lastmods, max_page_bytes=args.max_page_bytes,
+    )
+    sink.close()
+    lastmods.save()
+    print(f"Output stats: {sink.stats()}")
+    if args.graph_index:
+        print(f"Graph index written to {write_graph_index('all_entities.csv')}")
+    renderer.close("all_entities.csv")
+    print(f"Rendering stats: {renderer.stats()}")
+    if entity_store is not None:
+        print(f"Entity store stats: {entity_store.stats()}")
+        entity_store.close()
+    if corpus_graph is not None:
+        corpus_graph.save(f"{args.corpus_graph}.npz")
+        corpus_graph.export(args.corpus_graph, args.cooccurrence_min_weight, args.cooccurrence_neighbors)
+        print(f"Corpus graph stats: {corpus_graph.stats()}")
+
+    print(f"Inference stats: {predictor.stats()}")
+    if ner_pool is not None:
+        ner_pool.close()
+    if predictor.cache is not None:
+        print(f"NER cache stats: {predictor.cache.stats()}")
+        predictor.cache.close()
+    if page_buffer is not None:
+        page_buffer.close()
+    if http_cache is not None:
+        print(f"HTTP cache stats: {http_cache.stats()}")
+        http_cache.close()
+        crawl_cache.close()
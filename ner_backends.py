@@ -0,0 +1,168 @@
+import argparse
+import os
+import sys
+import time
+
+from inference import MODEL_NAME, get_model
+
+ONNX_DIR = "onnx_model"
+ONNX_FILE = "model.onnx"
+QUANTIZED_FILE = "model_quantized.onnx"
+
+# Sentences like the ones on the museum sites, used to check a backend against PyTorch
+FIXTURE_TEXTS = [
+    "Dia Azzawi was born in Baghdad, Iraq, in 1939 and studied archaeology before turning to painting.",
+    "The Iraqi artist Jewad Selim designed the Monument of Liberty, completed in 1961 in Tahrir Square.",
+    "Fahrelnissa Zeid moved from Istanbul to Paris in 1949, where she exhibited abstract canvases.",
+    "The bronze sculpture dates from the Abbasid era and was acquired by the museum in Doha in 2008.",
+    "Shakir Hassan Al Said founded the One Dimension group in Baghdad in 1971.",
+    "Inji Efflatoun, an Egyptian painter, was imprisoned in Cairo between 1959 and 1963.",
+    "This manuscript on paper, written in Damascus during the Mamluk period, is kept in Qatar.",
+    "ولد ضياء العزاوي في بغداد عام 1939 ودرس الآثار قبل أن يتجه إلى الرسم.",
+    "انتقلت فخر النساء زيد من إسطنبول إلى باريس عام 1949 حيث عرضت لوحاتها.",
+    "أسس شاكر حسن آل سعيد جماعة البعد الواحد في بغداد عام 1971.",
+]
+
+
+# Function to load the PyTorch model, as the scraper always has
+def load_torch(model_name=MODEL_NAME, onnx_dir=ONNX_DIR, quantized=False):
+    return get_model(model_name)
+
+# Function to load a model exported by export_onnx, run by ONNX Runtime
+def load_onnx(model_name=MODEL_NAME, onnx_dir=ONNX_DIR, quantized=False):
+    from gliner import GLiNER
+    onnx_file = QUANTIZED_FILE if quantized else ONNX_FILE
+    if not os.path.exists(os.path.join(onnx_dir, onnx_file)):
+        raise FileNotFoundError(f"{os.path.join(onnx_dir, onnx_file)} not found; run `python ner_backends.py export` first")
+    print(f"Loading {onnx_dir}/{onnx_file} with ONNX Runtime...")
+    return GLiNER.from_pretrained(onnx_dir, load_onnx_model=True, load_tokenizer=True, onnx_model_file=onnx_file)
+
+# Inference backends by name; each loader returns an object with GLiNER's predict methods
+BACKENDS = {
+    "torch": load_torch,
+    "onnx": load_onnx,
+}
+
+
+# Function to load the model with the chosen backend
+def load_backend(backend="torch", model_name=MODEL_NAME, onnx_dir=ONNX_DIR, quantized=False):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown NER backend: {backend} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[backend](model_name, onnx_dir, quantized)
+
+# Function to name a backend's model, so cached predictions of different backends are kept apart
+def backend_model_id(backend="torch", model_name=MODEL_NAME, quantized=False):
+    if backend == "torch":
+        return model_name
+    return f"{model_name}:{backend}{'-int8' if quantized else ''}"
+
+# Function to export the model to ONNX once, optionally with a dynamically quantized int8 copy
+def export_onnx(model_name=MODEL_NAME, onnx_dir=ONNX_DIR, quantize=True, opset=14):
+    import torch
+    from gliner import GLiNER
+
+    model = GLiNER.from_pretrained(model_name)
+    model.eval()
+    os.makedirs(onnx_dir, exist_ok=True)
+    model.save_pretrained(onnx_dir)  # Config and tokenizer, needed to load the ONNX model
+    onnx_path = os.path.join(onnx_dir, ONNX_FILE)
+
+    # Trace the model with a sample input; the axes that vary between batches stay dynamic
+    inputs, _ = model.prepare_model_inputs([FIXTURE_TEXTS[0]], ["person", "country", "date"])
+    input_names = ["input_ids", "attention_mask", "words_mask", "text_lengths"]
+    dynamic_axes = {
+        "input_ids": {0: "batch_size", 1: "sequence_length"},
+        "attention_mask": {0: "batch_size", 1: "sequence_length"},
+        "words_mask": {0: "batch_size", 1: "sequence_length"},
+        "text_lengths": {0: "batch_size", 1: "value"},
+        "logits": {0: "position", 1: "batch_size", 2: "sequence_length", 3: "num_classes"},
+    }
+    if model.config.span_mode != "token_level":
+        input_names += ["span_idx", "span_mask"]
+        dynamic_axes["span_idx"] = {0: "batch_size", 1: "num_spans", 2: "idx"}
+        dynamic_axes["span_mask"] = {0: "batch_size", 1: "num_spans"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model.model, tuple(inputs[name] for name in input_names), f=onnx_path, input_names=input_names,
+            output_names=["logits"], dynamic_axes=dynamic_axes, opset_version=opset,
+        )
+    print(f"Exported {model_name} to {onnx_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(onnx_dir, QUANTIZED_FILE)
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QUInt8)
+        print(f"Quantized weights to int8 in {quantized_path}")
+
+# Function to compare the entities two models find in the fixture texts
+def compare_backends(reference, candidate, labels_sets, texts=FIXTURE_TEXTS, threshold=0.5):
+    """
+    Predict the fixture texts with both models and report how far the candidate agrees.
+
+    Entities are compared by (start, end, label). Returns a dict with the number of
+    reference entities, how many the candidate found and missed, extra entities, the
+    largest score difference on matched entities and the time each model took.
+    """
+    report = {"reference": 0, "matched": 0, "missed": 0, "extra": 0, "max_score_diff": 0.0,
+              "reference_seconds": 0.0, "candidate_seconds": 0.0}
+    for labels in labels_sets:
+        started = time.perf_counter()
+        expected = reference.batch_predict_entities(texts, labels, threshold=threshold)
+        report["reference_seconds"] += time.perf_counter() - started
+        started = time.perf_counter()
+        actual = candidate.batch_predict_entities(texts, labels, threshold=threshold)
+        report["candidate_seconds"] += time.perf_counter() - started
+
+        for expected_entities, actual_entities in zip(expected, actual):
+            expected_by_span = {(e["start"], e["end"], e["label"]): e["score"] for e in expected_entities}
+            actual_by_span = {(e["start"], e["end"], e["label"]): e["score"] for e in actual_entities}
+            matched = expected_by_span.keys() & actual_by_span.keys()
+            report["reference"] += len(expected_by_span)
+            report["matched"] += len(matched)
+            report["missed"] += len(expected_by_span) - len(matched)
+            report["extra"] += len(actual_by_span) - len(matched)
+            for span in matched:
+                report["max_score_diff"] = max(report["max_score_diff"], abs(expected_by_span[span] - actual_by_span[span]))
+
+    report["agreement"] = round(report["matched"] / report["reference"], 3) if report["reference"] else 1.0
+    return report
+
+# Function to list the ways a comparison report falls short of the given limits
+def check_failures(report, min_agreement, max_score_diff=None):
+    failures = []
+    if report["agreement"] < min_agreement:
+        failures.append(f"agreement {report['agreement']} is below {min_agreement}")
+    if max_score_diff is not None and report["max_score_diff"] > max_score_diff:
+        failures.append(f"score difference {report['max_score_diff']:.4f} is above {max_score_diff}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the GLiNER model to ONNX and check it against PyTorch.")
+    parser.add_argument("command", choices=["export", "check"], help="export the model once, or compare the ONNX model with PyTorch")
+    parser.add_argument("--model", default=MODEL_NAME, help="GLiNER model to export or compare against")
+    parser.add_argument("--onnx-dir", default=ONNX_DIR, help="Folder the ONNX model is written to and read from")
+    parser.add_argument("--no-quantize", action="store_true", help="Only export the float model")
+    parser.add_argument("--quantized", action="store_true", help="Check the int8 model instead of the float one")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Prediction threshold used by the check")
+    parser.add_argument("--min-agreement", type=float, default=0.95,
+                        help="Share of the PyTorch entities the ONNX model must find for the check to pass")
+    parser.add_argument("--max-score-diff", type=float,
+                        help="Largest score difference on a matched entity allowed for the check to pass")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.onnx_dir, quantize=not args.no_quantize)
+    else:
+        from label_schemas import SCHEMAS
+        report = compare_backends(
+            load_backend("torch", args.model), load_backend("onnx", args.model, args.onnx_dir, args.quantized),
+            [schema.labels for schema in SCHEMAS.values()], threshold=args.threshold,
+        )
+        print(f"Backend check: {report}")
+        failures = check_failures(report, args.min_agreement, args.max_score_diff)
+        if failures:
+            print(f"Backend check failed: {'; '.join(failures)}")
+            sys.exit(1)
+        print("Backend check passed.")
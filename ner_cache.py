@@ -0,0 +1,108 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+SQL_VARIABLES = 500  # Keys looked up per query, below SQLite's limit on bound parameters
+
+
+class NerCache:
+    """
+    On-disk cache of GLiNER predictions, addressed by content.
+
+    The key is a SHA-256 of the model identifier, the label list, the threshold and the
+    chunk text, so a chunk seen on another page or in an earlier run is not predicted
+    again, while changing any of the inputs gives a new key. When the stored
+    predictions grow past `max_bytes` the least recently used ones are evicted.
+    """
+
+    def __init__(self, path, model_id, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS predictions (
+                key TEXT PRIMARY KEY,
+                entities TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS predictions_used_at ON predictions (used_at)")
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM predictions").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def key(self, text, labels, threshold):
+        prefix = json.dumps([self.model_id, list(labels), float(threshold)], ensure_ascii=False)
+        return hashlib.sha256(f"{prefix}\n{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts, labels, threshold):
+        """Return the cached predictions for some texts, as a dict from position in `texts` to entities."""
+        keys = [self.key(text, labels, threshold) for text in texts]
+        found = {}
+        with self.lock, self.connection:
+            unique_keys = list(set(keys))
+            for start in range(0, len(unique_keys), SQL_VARIABLES):
+                batch = unique_keys[start:start + SQL_VARIABLES]
+                rows = self.connection.execute(
+                    f"SELECT key, entities FROM predictions WHERE key IN ({','.join('?' * len(batch))})", batch,
+                )
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.connection.executemany("UPDATE predictions SET used_at = ? WHERE key = ?", [(now, key) for key in found])
+
+        results = {i: json.loads(found[key]) for i, key in enumerate(keys) if key in found}
+        self.hits += len(results)
+        self.misses += len(texts) - len(results)
+        return results
+
+    def put_many(self, texts, labels, threshold, results):
+        """Store the predictions for some texts and evict old ones if the cache has grown too big."""
+        now = time.time()
+        rows = []
+        for text, entities in zip(texts, results):
+            value = json.dumps(entities, ensure_ascii=False)
+            rows.append((self.key(text, labels, threshold), value, len(value.encode("utf-8")), now))
+
+        with self.lock, self.connection:
+            for key, value, size, used_at in rows:
+                old = self.connection.execute("SELECT size FROM predictions WHERE key = ?", (key,)).fetchone()
+                self.size += size - (old[0] if old else 0)
+                self.connection.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)", (key, value, size, used_at))
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # Drop the least recently used predictions until the cache is back to 90% of its limit
+        target = self.max_bytes * 0.9
+        doomed = []
+        for key, size in self.connection.execute("SELECT key, size FROM predictions ORDER BY used_at"):
+            if self.size <= target:
+                break
+            doomed.append((key,))
+            self.size -= size
+        self.connection.executemany("DELETE FROM predictions WHERE key = ?", doomed)
+        self.evicted += len(doomed)
+
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries, "bytes": self.size, "evicted": self.evicted,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
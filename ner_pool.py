@@ -0,0 +1,67 @@
+import gc
+import multiprocessing
+import os
+
+# Model used by the forked workers; set in the parent just before forking
+worker_model = None
+
+
+# Function run once in every worker to keep the workers from oversubscribing the cores
+def init_worker(threads):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass  # Inter-op threads can only be set before torch first uses them
+
+# Function run in a worker on one slice of a batch
+def predict_in_worker(task):
+    texts, labels, threshold = task
+    return worker_model.batch_predict_entities(texts, labels, threshold=threshold)
+
+
+class NerPool:
+    """
+    Runs a loaded GLiNER model in forked worker processes, usable wherever the model is.
+
+    The model is loaded once in the parent; the workers are forked from it and share the
+    weights copy-on-write, so memory does not grow with the number of workers. Each call
+    is split evenly into one slice per worker, of at most `slice_size` texts, that the
+    workers predict in parallel, and the results are put back in order. Every slice is
+    predicted exactly as the serial path would predict a batch of the same texts. Calls
+    may come from several threads at once; their slices share the workers.
+
+    Must be created before the pipeline starts its threads, since forking a process
+    that has other threads running can deadlock the children.
+    """
+
+    def __init__(self, model, processes=None, threads=None, slice_size=8):
+        global worker_model
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("The NER process pool needs the fork start method, which this platform does not have")
+        self.processes = processes or os.cpu_count() or 1
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.processes)
+        self.slice_size = slice_size
+        self.model = model
+
+        worker_model = model
+        gc.freeze()  # Keep the collector from touching, and so copying, the parent's objects in the workers
+        context = multiprocessing.get_context("fork")
+        self.pool = context.Pool(self.processes, initializer=init_worker, initargs=(self.threads,))
+        gc.unfreeze()
+
+    def batch_predict_entities(self, texts, labels, threshold=0.5, **kwargs):
+        size = max(1, min(self.slice_size, -(-len(texts) // self.processes)))
+        tasks = [(texts[start:start + size], list(labels), threshold) for start in range(0, len(texts), size)]
+        results = []
+        for entities in self.pool.map(predict_in_worker, tasks, chunksize=1):
+            results.extend(entities)
+        return results
+
+    def predict_entities(self, text, labels, threshold=0.5, **kwargs):
+        return self.batch_predict_entities([text], labels, threshold)[0]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
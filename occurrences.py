@@ -0,0 +1,116 @@
+from collections import deque
+from functools import lru_cache
+
+try:
+    import ahocorasick  # Optional pyahocorasick package, a C implementation of the same automaton
+except ImportError:
+    ahocorasick = None
+
+
+class Automaton:
+    """
+    Aho-Corasick automaton over a set of patterns, in pure Python.
+
+    Each state is a node of the trie of all patterns. `fail` points to the state of the
+    longest proper suffix that is also in the trie, and `output_link` to the nearest
+    state along the fail chain where a pattern ends, so all matches ending at a position
+    are found without walking states that end none.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.goto = [{}]
+        self.ends = [None]  # Index of the pattern ending at each state
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.ends.append(None)
+                state = self.goto[state][char]
+            self.ends[state] = index
+
+        self.fail = [0] * len(self.goto)
+        self.output_link = [None] * len(self.goto)
+        states = deque(self.goto[0].values())
+        while states:
+            state = states.popleft()
+            for char, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                target = self.fail[child]
+                self.output_link[child] = target if self.ends[target] is not None else self.output_link[target]
+                states.append(child)
+
+    def iter(self, text):
+        """Yield (end position, pattern index) for every match, overlapping ones included, by end position."""
+        goto, fail, ends, output_link = self.goto, self.fail, self.ends, self.output_link
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = state if ends[state] is not None else output_link[state]
+            while match is not None:
+                yield position, ends[match]
+                match = output_link[match]
+
+
+# Function to build the automaton for a set of patterns once and reuse it when the same set comes back
+@lru_cache(maxsize=256)
+def build_automaton(patterns):
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for index, pattern in enumerate(patterns):
+            automaton.add_word(pattern, index)
+        automaton.make_automaton()
+        return automaton
+    return Automaton(patterns)
+
+# Function to tell if a match is a whole word, i.e. not preceded or followed by a letter, digit or underscore
+def is_whole_word(text, start, end):
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not (before.isalnum() or before == "_" or after.isalnum() or after == "_")
+
+# Function to count the occurrences of many patterns in a single pass over the text
+def count_occurrences(text, patterns, case_sensitive=True, whole_words=False):
+    """
+    Count each pattern in text the way str.count does: matches of the same pattern do not
+    overlap and are taken from left to right. Matches of different patterns may overlap.
+
+    Args:
+        text (str): The text to search.
+        patterns (iterable of str): The strings to count.
+        case_sensitive (bool): If False, text and patterns are compared lower-cased.
+        whole_words (bool): If True, only matches that are not part of a longer word count.
+
+    Returns:
+        dict: The number of occurrences of every pattern.
+    """
+    keys = {pattern: pattern if case_sensitive else pattern.lower() for pattern in set(patterns)}
+    search_text = text if case_sensitive else text.lower()
+
+    # The automaton cannot hold the empty string; str.count finds it between every two characters
+    empty_count = 0 if whole_words else len(search_text) + 1
+    searched = sorted({key for key in keys.values() if key})
+    if searched:
+        automaton = build_automaton(tuple(searched))
+        found = [0] * len(searched)
+        next_start = [0] * len(searched)
+        for end, index in automaton.iter(search_text):
+            start = end - len(searched[index]) + 1
+            if start < next_start[index]:
+                continue
+            if whole_words and not is_whole_word(search_text, start, end + 1):
+                continue
+            found[index] += 1
+            next_start[index] = end + 1
+        found_by_key = dict(zip(searched, found))
+    else:
+        found_by_key = {}
+
+    return {pattern: found_by_key[key] if key else empty_count for pattern, key in keys.items()}
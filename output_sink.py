@@ -0,0 +1,127 @@
+import csv
+import os
+import threading
+import time
+
+COLUMNS = ['Link', 'Entity', 'Label', 'Occurrences']
+
+
+# Function to get the Arrow schema of the entity rows
+def arrow_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("Link", pa.string()),
+        ("Entity", pa.string()),
+        ("Label", pa.string()),
+        ("Occurrences", pa.int64()),
+    ])
+
+
+class OutputSink:
+    """
+    Collects the entity rows of all pages and writes them out in batches.
+
+    Rows are kept in memory and appended to the CSV file, and optionally to a Parquet
+    (.parquet) or Arrow IPC (.arrow/.feather) file, once `batch_size` rows have
+    accumulated or `interval` seconds have passed since the last write, whichever comes
+    first. Each batch is one CSV write and one Parquet row group or Arrow record batch.
+    The CSV file is truncated and given a header unless `append` is set; the columnar
+    file is always written anew, since neither format can be appended to. With an
+    EntityStore, every batch is also saved to it in one transaction, and with a
+    CorpusGraph every batch is added to the co-occurrence graph.
+    """
+
+    def __init__(self, csv_path="all_entities.csv", columnar_path=None, batch_size=5000, interval=5.0, append=False,
+                 store=None, graph=None):
+        self.csv_path = csv_path
+        self.columnar_path = columnar_path
+        self.store = store
+        self.graph = graph
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.rows = []
+        self.pages = []  # Pages whose rows are in self.rows, including pages without any
+        self.rows_written = 0
+        self.batches_written = 0
+        self.last_flush = time.monotonic()
+
+        if csv_path and not append:
+            with open(csv_path, mode='w', newline='', encoding='utf-8-sig') as csv_file:
+                csv.writer(csv_file).writerow(COLUMNS)
+
+        self.columnar_writer = None
+        if columnar_path:
+            directory = os.path.dirname(columnar_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if columnar_path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+                self.columnar_writer = pq.ParquetWriter(columnar_path, arrow_schema(), compression="zstd")
+            else:
+                import pyarrow as pa
+                self.columnar_writer = pa.ipc.new_file(columnar_path, arrow_schema())
+
+    def write(self, rows, page=None):
+        """
+        Add rows of [link, entity, label, occurrences] and write them out if a batch is due.
+
+        Args:
+            rows (list): The rows of one or more whole pages.
+            page (str): The page the rows belong to, so the store and graph replace it even if it has no rows.
+        """
+        with self.lock:
+            self.rows.extend(rows)
+            if page is not None:
+                self.pages.append(page)
+            due = len(self.rows) >= self.batch_size or time.monotonic() - self.last_flush >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            rows, self.rows = self.rows, []
+            pages, self.pages = self.pages, []
+            self.last_flush = time.monotonic()
+            if not rows and not pages:
+                return
+            if self.csv_path and rows:
+                with open(self.csv_path, mode='a', newline='', encoding='utf-8-sig') as csv_file:
+                    csv.writer(csv_file).writerows(rows)
+            if self.columnar_writer is not None and rows:
+                import pyarrow as pa
+                columns = list(zip(*rows))
+                table = pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, arrow_schema())],
+                    schema=arrow_schema(),
+                )
+                self.columnar_writer.write_table(table)
+            if self.store is not None:
+                self.store.add_rows(rows, pages)
+            if self.graph is not None:
+                self.graph.add_rows(rows, pages)
+            self.rows_written += len(rows)
+            self.batches_written += 1
+
+    def stats(self):
+        return {"rows": self.rows_written + len(self.rows), "batches": self.batches_written}
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.columnar_writer is not None:
+                self.columnar_writer.close()
+                self.columnar_writer = None
+
+
+# Function to load the entity rows written by an OutputSink as an Arrow table.
+# Parquet and Arrow IPC files are memory-mapped, and Arrow IPC columns are read without copying.
+def load_corpus(path):
+    import pyarrow as pa
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True)
+    if path.endswith(".csv"):
+        import pyarrow.csv as pa_csv
+        return pa_csv.read_csv(path)  # The UTF-8 BOM of all_entities.csv is skipped by the reader
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
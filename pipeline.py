@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import time
+import traceback
+
+from fetching import MAX_PAGE_BYTES
+from httpcache import NotModified
+from output_sink import OutputSink
+from scrapper_all import count_entities, fetch_main_content_advanced, page_csv_path, reuse_page_results, save_page_results
+
+STOP = object()  # Sent downstream once a stage has no more items
+
+
+class Stage:
+    """
+    A pool of worker threads that read items from a bounded inbox and put results in an outbox.
+
+    handler(item) returns the result to pass on, or None to drop the item. An exception
+    is reported and drops the item without stopping the stage. When the last worker
+    sees STOP, one STOP per downstream worker is sent on.
+    """
+
+    def __init__(self, name, handler, inbox, outbox, workers=1, downstream_workers=1):
+        self.name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.downstream_workers = downstream_workers
+        self.finished = 0
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self.run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def run(self):
+        while True:
+            item = self.inbox.get()
+            if item is STOP:
+                break
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                print(f"An error occurred in the {self.name} stage for {item if isinstance(item, str) else item[0]}: {e}")
+                traceback.print_exc()
+                continue
+            if result is not None:
+                self.outbox.put(result)  # Blocks while the next stage is behind
+
+        with self.lock:
+            self.finished += 1
+            last_worker = self.finished == self.workers
+        if last_worker:
+            for _ in range(self.downstream_workers):
+                self.outbox.put(STOP)
+
+
+# Function to run discovery, fetching, entity extraction and saving as overlapping stages.
+# discover(emit) must call emit(url) for every page to process, or emit(url, True) for a page known to be unchanged;
+# it runs in its own thread and is slowed down by the bounded queues when the later stages fall behind.
+# With a LastmodLog, a page's sitemap lastmod is committed once the page is saved.
+def run_pipeline(discover, folder_name, website_type, start_phrase, end_phrase, fetch_workers=4, ner_workers=1,
+                 queue_size=16, cache=None, page_buffer=None, templates=None, sink=None, page_files=True, renderer=None,
+                 lastmods=None, max_page_bytes=MAX_PAGE_BYTES):
+    url_queue = queue.Queue(maxsize=queue_size)
+    content_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=queue_size)
+    started = time.monotonic()
+    first_result = None
+    pages_saved = 0
+    own_sink = sink is None
+    if own_sink:
+        sink = OutputSink()
+
+    def fetch_page(item):
+        url, unchanged = item
+        # Only ask for a conditional fetch when the results of the last run are still on disk,
+        # but always collect the validators so the next run can
+        saved = os.path.exists(page_csv_path(folder_name, url)) or (sink.store is not None and sink.store.has_page(url))
+        if unchanged and saved:
+            print(f"\n{url} has the same sitemap lastmod as in the last run, reusing its saved entities.")
+            return url, None
+        print(f"\nFetching content for {url}...")
+        try:
+            chunks = fetch_main_content_advanced(
+                url, start_phrase, end_phrase, cache=cache, page_buffer=page_buffer, templates=templates,
+                max_bytes=max_page_bytes, conditional=saved,
+            )
+        except NotModified:
+            print(f"{url} is unchanged since the last run, reusing its saved entities.")
+            return url, None
+        print("Content fetched successfully!")
+        return url, chunks
+
+    def extract(item):
+        url, chunks = item
+        if chunks is None:
+            return item
+        return url, count_entities(url, chunks, website_type)
+
+    def emit(url, unchanged=False):
+        url_queue.put((url, unchanged))
+
+    def discover_all():
+        try:
+            discover(emit)
+        except Exception as e:
+            print(f"An error occurred while discovering pages: {e}")
+            traceback.print_exc()
+        finally:
+            for _ in range(fetch_workers):
+                url_queue.put(STOP)
+
+    stages = [
+        Stage("fetch", fetch_page, url_queue, content_queue, fetch_workers, ner_workers).start(),
+        Stage("extract", extract, content_queue, result_queue, ner_workers, 1).start(),
+    ]
+    threading.Thread(target=discover_all, name="discover", daemon=True).start()
+
+    # Save results on the main thread, which matplotlib needs when drawing inline
+    while True:
+        item = result_queue.get()
+        if item is STOP:
+            break
+        url, sorted_entity_counts = item
+        try:
+            if sorted_entity_counts is None:
+                reuse_page_results(url, folder_name, sink)
+            else:
+                save_page_results(url, sorted_entity_counts, folder_name, sink, page_files, renderer)
+        except Exception as e:
+            print(f"An error occurred while processing {url}: {e}")
+            traceback.print_exc()
+            if cache is not None:
+                cache.discard(url)
+            if lastmods is not None:
+                lastmods.discard(url)
+            continue
+        # Only now may the next run take the page as unchanged
+        if cache is not None:
+            cache.commit(url)
+        if lastmods is not None:
+            lastmods.commit(url)
+        pages_saved += 1
+        if first_result is None:
+            first_result = time.monotonic() - started
+            print(f"First page saved after {first_result:.1f} seconds.")
+
+    for stage in stages:
+        for thread in stage.threads:
+            thread.join()
+    if own_sink:
+        sink.close()
+    else:
+        sink.flush()
+    print(f"\nProcessed {pages_saved} pages in {time.monotonic() - started:.1f} seconds.")
+    return pages_saved
@@ -0,0 +1,148 @@
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from fetching import fetch
+from throttling import RateController
+
+
+class RateLimitedSite:
+    """
+    Stand-in for a museum site that rate-limits its clients.
+
+    Requests beyond `rate` per second (with bursts of up to `burst`) are answered with
+    429 and a Retry-After header. Every answer takes `latency` seconds, and a share
+    `error_rate` of the requests fails with 503, so the throttle's back-off, Retry-After
+    handling and AIMD concurrency can be watched without touching a real site. Paths
+    under /redirect-loop/ redirect to themselves forever and are not rate-limited, to
+    check that a failed fetch gives its throttle slot back.
+    """
+
+    def __init__(self, rate=4.0, burst=4, retry_after=1, latency=0.05, error_rate=0.0):
+        self.rate = rate
+        self.burst = burst
+        self.retry_after = retry_after
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {"served": 0, "limited": 0, "errors": 0}
+
+    def admit(self):
+        """Return the status the site answers the next request with."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens < 1:
+                self.counts["limited"] += 1
+                return 429
+            self.tokens -= 1
+            if random.random() < self.error_rate:
+                self.counts["errors"] += 1
+                return 503
+            self.counts["served"] += 1
+            return 200
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+# Function to make the request handler class of a stand-in site
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(site.latency)
+            if self.path.startswith("/redirect-loop/"):
+                self.send_response(302)
+                self.send_header("Location", self.path)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = site.admit()
+            body = f"<html><body><p>{self.path}</p></body></html>".encode("utf-8") if status == 200 else b""
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", str(site.retry_after))
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+# Function to start a stand-in site in a background thread, returning the server and its base URL
+def start_site(site, host="127.0.0.1", port=0):
+    server = ThreadingHTTPServer((host, port), make_handler(site))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+# Function to fetch pages of a stand-in site through a fresh rate controller and report what happened.
+# The redirect loops are fetched first: if a failed fetch kept its slot, the pages after them would never be fetched.
+def check_throttle(site, pages=40, workers=8, rate=5.0, burst=5, redirect_loops=2):
+    server, base_url = start_site(site)
+    controller = RateController(rate=rate, burst=burst)
+    failed_loops = 0
+    started = time.monotonic()
+    try:
+        for i in range(redirect_loops):
+            try:
+                fetch(f"{base_url}/redirect-loop/{i}", controller=controller, max_retries=0)
+            except requests.exceptions.TooManyRedirects:
+                failed_loops += 1
+        with ThreadPoolExecutor(workers) as executor:
+            statuses = list(executor.map(lambda i: fetch(f"{base_url}/page-{i}", controller=controller).status, range(pages)))
+    finally:
+        server.shutdown()
+        server.server_close()
+    elapsed = time.monotonic() - started
+    return {
+        "pages": pages,
+        "ok": statuses.count(200),
+        "redirect_loops_failed": failed_loops,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(pages / elapsed, 2),
+        "site": site.stats(),
+        "throttle": controller.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for a rate-limiting site, to exercise the fetch throttle.")
+    parser.add_argument("command", choices=["serve", "check"],
+                        help="serve the stand-in site, or fetch pages from one through the throttle and report")
+    parser.add_argument("--site-rate", type=float, default=4.0, help="Requests per second the site accepts before answering 429")
+    parser.add_argument("--site-burst", type=int, default=4, help="Requests the site accepts in one burst")
+    parser.add_argument("--retry-after", type=int, default=1, help="Seconds sent in the Retry-After header of a 429")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the site takes to answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--port", type=int, default=8766, help="Port the site listens on (serve)")
+    parser.add_argument("--pages", type=int, default=40, help="Pages fetched (check)")
+    parser.add_argument("--workers", type=int, default=8, help="Threads fetching at the same time (check)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Client request rate of the throttle (check)")
+    parser.add_argument("--burst", type=int, default=5, help="Client burst of the throttle (check)")
+    parser.add_argument("--redirect-loops", type=int, default=2, help="Redirect loops fetched before the pages (check)")
+    args = parser.parse_args()
+
+    site = RateLimitedSite(args.site_rate, args.site_burst, args.retry_after, args.latency, args.error_rate)
+    if args.command == "serve":
+        server, base_url = start_site(site, port=args.port)
+        print(f"Serving a rate-limited site on {base_url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"Site stats: {site.stats()}")
+            server.shutdown()
+    else:
+        print(f"Throttle check: {check_throttle(site, args.pages, args.workers, args.rate, args.burst, args.redirect_loops)}")
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+MODES = ("inline", "pool", "end", "corpus", "off")
+
+
+# Function run once in every rendering process, before matplotlib is first imported there
+def init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+# Function to get the word cloud path of a page, next to its CSV file
+def word_cloud_path(folder_name, bio_url):
+    return os.path.join(folder_name, bio_url.split('/')[-1].replace('.aspx', '') + '_wordcloud.png')
+
+# Function to draw the word cloud and graphs of one page from its CSV file
+def render_page(csv_name, bio_url, save_path, top_k=None):
+    from finalWordCloud import generate_word_cloud
+    from graphs import generate_graphs
+    generate_word_cloud(csv_name, [bio_url], save_path)
+    generate_graphs(csv_name, top_k)
+    return csv_name
+
+# Function to draw one word cloud and one set of graphs for all the pages in an entity CSV file
+def render_corpus(csv_name, title="All pages", top_k=None):
+    import pandas as pd
+    from finalWordCloud import read_frequencies, render_word_cloud
+    from graphs import generate_graphs_from_frame
+
+    base = os.path.splitext(csv_name)[0]
+    totals = Counter()
+    for entity, frequency in read_frequencies(csv_name):
+        totals[entity] += frequency
+    render_word_cloud(totals.items(), title, f"{base}_wordcloud.png")
+    generate_graphs_from_frame(pd.read_csv(csv_name, encoding="utf-8-sig"), f"{base}_graphs", top_k)
+    return csv_name
+
+# Function to hash a rendering input file
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Renderer:
+    """
+    Draws word clouds and graphs away from the scraping path.
+
+    Modes:
+        inline: draw each page as it is saved, in the calling thread, as before
+        pool:   queue each page to a pool of worker processes as it is saved
+        end:    collect the pages and draw them all in the pool when the run ends
+        corpus: draw only one word cloud and one set of graphs for the whole corpus at the end
+        off:    draw nothing
+
+    Jobs are keyed by their input CSV file. A manifest keeps the hash of every input
+    that was drawn, and a job whose input has not changed since is skipped as long as
+    its word cloud is still there. top_k caps the entities drawn in each label graph.
+    The workers use matplotlib's Agg backend and are spawned rather than forked, since
+    the pipeline already runs threads.
+    """
+
+    def __init__(self, mode="pool", processes=None, manifest_path="render_manifest.json", top_k=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown rendering mode: {mode} (choose from {', '.join(MODES)})")
+        self.mode = mode
+        self.processes = processes
+        self.manifest_path = manifest_path
+        self.top_k = top_k
+        self.manifest = {}
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, mode='r', encoding='utf-8') as file:
+                self.manifest = json.load(file)
+        self.executor = None
+        self.futures = {}  # future -> (csv path, input hash)
+        self.pending = []  # jobs kept for the end of the run
+        self.rendered = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def start_pool(self):
+        if self.executor is None:
+            context = multiprocessing.get_context("spawn")
+            self.executor = ProcessPoolExecutor(self.processes, mp_context=context, initializer=init_worker)
+        return self.executor
+
+    def input_hash(self, csv_name):
+        return f"{file_hash(csv_name)}:{self.top_k}"  # Drawing with another top_k changes the output too
+
+    def unchanged(self, csv_name, input_hash, save_path):
+        return self.manifest.get(csv_name) == input_hash and os.path.exists(save_path)
+
+    def submit(self, csv_name, bio_url, folder_name):
+        """Queue the word cloud and graphs of a page whose CSV file has just been written."""
+        if self.mode in ("corpus", "off"):
+            return
+        save_path = word_cloud_path(folder_name, bio_url)
+        input_hash = self.input_hash(csv_name)
+        if self.unchanged(csv_name, input_hash, save_path):
+            self.skipped += 1
+            return
+
+        if self.mode == "inline":
+            self.run_inline(render_page, csv_name, input_hash, csv_name, bio_url, save_path, self.top_k)
+        elif self.mode == "pool":
+            future = self.start_pool().submit(render_page, csv_name, bio_url, save_path, self.top_k)
+            self.futures[future] = (csv_name, input_hash)
+        else:
+            self.pending.append((csv_name, input_hash, bio_url, save_path))
+
+    def run_inline(self, function, key, input_hash, *args):
+        try:
+            function(*args)
+        except Exception as e:
+            print(f"An error occurred while drawing {key}: {e}")
+            traceback.print_exc()
+            self.failed += 1
+            return
+        self.manifest[key] = input_hash
+        self.rendered += 1
+
+    def wait(self):
+        for future, (csv_name, input_hash) in list(self.futures.items()):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"An error occurred while drawing {csv_name}: {e}")
+                self.failed += 1
+            else:
+                self.manifest[csv_name] = input_hash
+                self.rendered += 1
+        self.futures = {}
+
+    def close(self, corpus_csv="all_entities.csv"):
+        """
+        Finish every queued job and save the manifest.
+
+        Args:
+            corpus_csv (str): The flushed CSV file of all entities, drawn in corpus mode.
+        """
+        if self.mode == "end":
+            for csv_name, input_hash, bio_url, save_path in self.pending:
+                future = self.start_pool().submit(render_page, csv_name, bio_url, save_path, self.top_k)
+                self.futures[future] = (csv_name, input_hash)
+            self.pending = []
+        elif self.mode == "corpus" and corpus_csv and os.path.exists(corpus_csv):
+            input_hash = self.input_hash(corpus_csv)
+            save_path = f"{os.path.splitext(corpus_csv)[0]}_wordcloud.png"
+            if self.unchanged(corpus_csv, input_hash, save_path):
+                self.skipped += 1
+            else:
+                self.run_inline(render_corpus, corpus_csv, input_hash, corpus_csv, "All pages", self.top_k)
+
+        self.wait()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.manifest_path:
+            with open(self.manifest_path, mode='w', encoding='utf-8') as file:
+                json.dump(self.manifest, file, indent=1)
+
+    def stats(self):
+        return {"mode": self.mode, "rendered": self.rendered, "skipped": self.skipped, "failed": self.failed}
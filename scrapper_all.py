@@ -1,235 +1,168 @@
-import requests
-from bs4 import BeautifulSoup
-from finalMapping_v2 import is_it_a_nationality
-from finalMapping_v2 import is_arabic_country
+from chunking import chunk_text, document_text
+from extraction import extract_main_content, template_for
+from fetching import MAX_PAGE_BYTES, fetch
+from httpcache import NotModified
+from inference import BatchPredictor
+from label_schemas import apply_schema, schema_for
+from occurrences import count_occurrences
+from output_sink import OutputSink
 from finalWordCloud import generate_word_cloud
 from graphs import generate_graphs, generate_interactive_graph
-from gliner import GLiNER
-import re
 import csv
 from collections import Counter
 import os
 
-# Initialize GLiNER with the base model
-model = GLiNER.from_pretrained("urchade/gliner_multi-v2.1")
-
-pronoun_list = {"he", "she", "him", "her", "it", "they", "them", "we", "us", "i", "me", "you", "his", "their", "our"}
-
-labels = ["Human", "Country", "Date", "Era", "Material"]
-labels2 = ["مادة", "عصر", "تاريخ", "دولة", "إنسان"]
-labels3 = ["Person", "Place", "City", "Country", "Date"]
-labels4 = ["مدينة", "مكان", "تاريخ", "دولة", "اسم"]
-
-# Function to extract content between start and end phrases
-def fetch_main_content_advanced(url, start_phrase, end_phrase):
-    response = requests.get(url)
-    if response.status_code == 200:
-        content = response.text
-        soup = BeautifulSoup(content, "html.parser")
-        clean_content = re.sub(r'<[^>]+>', ' ', str(soup))
-        # Find content between the specified phrases
-        start_index = clean_content.find(start_phrase)
-        end_index = clean_content.find(end_phrase, start_index)
-
-        if start_index != -1 and end_index != -1:
-            extracted_content = clean_content[start_index:end_index].strip()
-            return split_into_chunks(extracted_content)
+# Batches the chunks of every page being processed into shared model calls.
+# GLiNER (urchade/gliner_multi-v2.1) is loaded on the first prediction, not at import.
+predictor = BatchPredictor()
+
+CHUNK_TOKENS = 384  # gliner_multi-v2.1 max_len, counted in words as GLiNER splits them
+CHUNK_OVERLAP = 32  # Tokens repeated between consecutive chunks so entities are not cut at a boundary
+
+# Function to extract content between start and end phrases.
+# Pages the crawler already downloaded are taken from page_buffer instead of being fetched again.
+# With an HttpCache, raises NotModified when the page is unchanged since the last run; its validators are kept
+# for cache.commit(url) once the page is saved. With conditional=False the page is always fetched and processed.
+# If templates has an entry for the page's host, its CSS/XPath selector is used instead of the phrases.
+def fetch_main_content_advanced(url, start_phrase, end_phrase, cache=None, page_buffer=None, templates=None,
+                                max_bytes=MAX_PAGE_BYTES, conditional=True):
+    response = page_buffer.take(url) if page_buffer is not None else None
+    if response is None:
+        headers = cache.conditional_headers(url) if cache is not None and conditional else None
+        response = fetch(url, headers=headers, max_bytes=max_bytes)
+    if cache is not None:
+        response = cache.check(url, response, conditional)
+    if response.status == 304:
+        raise NotModified(url)
+    if response.status == 200:
+        body = response.body[:max_bytes] if max_bytes else response.body
+        extracted_content = extract_main_content(body, start_phrase, end_phrase, response.headers, template_for(url, templates))
+
+        if extracted_content is not None:
+            # Normalize whitespace so chunk offsets refer to the same text the entities are counted in
+            return chunk_text(" ".join(extracted_content.split()), CHUNK_TOKENS, CHUNK_OVERLAP)
         else:
             raise ValueError("Specified phrases not found in the content.")
     else:
-        raise Exception(f"Failed to fetch {url}, status code: {response.status_code}")
-
-# Function to split content into word-safe chunks
-def split_into_chunks(content, chunk_size=500):
-    words = content.split()
-    chunks = []
-    current_chunk = []
-
-    for word in words:
-        if len(" ".join(current_chunk + [word])) > chunk_size:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-        else:
-            current_chunk.append(word)
-
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    return chunks
+        raise Exception(f"Failed to fetch {url}, status code: {response.status}")
 
 # Function to extract entities from content 
 def extract_entities(biography_content, bio_url, website_type, language):
     all_entities = []
     print(f"\nextracting entities for: {bio_url}")
 
-    if website_type == 2:
-        if "/en/" in bio_url.lower():
-            #print("Language: English")
-            #language = "English"
-            current_labels = labels3  # labels for website_type 2 and /en/ in URL
-            threshold = 0.5
-        elif "/ar/" in bio_url.lower():
-           # print("Language: Arabic")
-            #language = "Arabic"
-            current_labels = labels4  # labels for website_type 2 and /ar/ in URL
-            threshold = 0.6
+    # The labels, threshold and post-processing of each kind of page are set in label_schemas.py
+    schema = schema_for(website_type, language)
+
+    seen_spans = set()
+    predictions = predictor.predict([chunk.text for chunk in biography_content], schema.labels, schema.threshold)
+    for chunk, entities in zip(biography_content, predictions):
+        for entity in entities:
+            # Map the span back to the document and drop repeats found again in the overlap
+            entity["start"] += chunk.start
+            entity["end"] += chunk.start
+            span = (entity["start"], entity["end"], entity["label"])
+            if span not in seen_spans:
+                seen_spans.add(span)
+                all_entities.append(entity)
+
+    buckets = apply_schema(schema, all_entities)
+
+    sorted_human_names = sorted(buckets["human_names"], key=lambda x: x[0])
+    sorted_countries = sorted(buckets["countries"], key=lambda x: x[0])
+    sorted_dates = sorted(buckets["dates"], key=lambda x: int(x[0]) if x[0].isdigit() else x[0])
+    sorted_places = sorted(buckets["places"], key=lambda x: x[0])
+    sorted_cities = sorted(buckets["cities"], key=lambda x: x[0])
 
-    elif website_type == 1:
-        if "/en/" in bio_url.lower():
-            #print("Language: English")
-            #language = "English"
-            current_labels = labels  # labels for website_type 1 and /en/ in URL
-            threshold = 0.5
-        elif "/ar/" in bio_url.lower():
-            #print("Language: Arabic")
-            #language = "Arabic"
-            current_labels = labels2  # labels for website_type 1 and /ar/ in URL
-            threshold = 0.6
+    return sorted_human_names, sorted_countries, sorted_dates, sorted_places, sorted_cities
 
-    else:
-        raise ValueError("Language not recognized. URL must contain '/en/' or '/ar/'.")
-
-    for chunk in biography_content:
-        entities = model.predict_entities(chunk, current_labels, threshold)
-        all_entities.extend(entities)
-
-    arabic_pattern = re.compile(r'[\u0600-\u06FF]')
-    human_names = set()
-    countries = set()
-    dates = set()
-    places = set()
-    cities = set()
-
-    for entity in all_entities:
-        label = entity["label"]
-        text = entity["text"].strip()
-        if website_type == 2 and language == "English":
-            # Process entities for English
-            if label == "Person" and text[0].isupper() and text.lower() not in pronoun_list:
-                human_names.add((text, label))
-            elif label == "Country":
-                country = is_it_a_nationality('countries_and_demonyms.csv', text) or text
-                countries.add((country, label))
-            elif label == "Date":
-                match = re.search(r'\b(18|19|20)\d{2}\b', text)
-                if match:
-                    dates.add((match.group(0), label))
-            elif label == "Place":
-                places.add((text, label))
-            elif label == "City":
-                cities.add((text, label))
-
-        elif website_type == 2 and language == "Arabic":
-            if label in ["اسم", "دولة", "مكان", "مدينة"] and not arabic_pattern.search(text):
-                continue
-            # Process entities for Arabic
-            if label == "اسم":
-                human_names.add((text, label))
-            elif label == "دولة":
-                countries.add((text, label))
-            elif label == "تاريخ":
-                match = re.search(r'\b(18|19|20)\d{2}\b', text)
-                if match:
-                    dates.add((match.group(0), label))
-            elif label == "مكان":
-                places.add((text, label))
-            elif label == "مدينة":
-                if not is_arabic_country('countries_and_demonyms.csv', text):
-                    cities.add((text, label))
-
-        if website_type == 1 and language == "English":
-            # Process entities for English
-            if label == "Human" and text[0].isupper() and text.lower() not in pronoun_list:
-                human_names.add((text, label))
-            elif label == "Country":
-                country = is_it_a_nationality('countries_and_demonyms.csv', text) or text
-                countries.add((country, label))
-            elif label == "Date":
-                match = re.search(r'\b(18|19|20)\d{2}\b', text)
-                if match:
-                    dates.add((match.group(0), label))
-            elif label == "Era":
-                places.add((text, label))
-            elif label == "Material":
-                cities.add((text, label))
-
-        elif website_type == 1 and language == "Arabic":
-            if label in ["مادة", "عصر", "تاريخ", "دولة", "إنسان"] and not arabic_pattern.search(text):
-                continue
-            # Process entities for Arabic
-            if label == "إنسان":
-                human_names.add((text, label))
-            elif label == "دولة":
-                countries.add((text, label))
-            elif label == "تاريخ":
-                match = re.search(r'\b(18|19|20)\d{2}\b', text)
-                if match:
-                    dates.add((match.group(0), label))
-            elif label == "عصر":
-                places.add((text, label))
-            elif label == "مادة":
-                if not is_arabic_country('countries_and_demonyms.csv', text):
-                    cities.add((text, label))
-
-   # print(f"Processing chunk with labels: {current_labels} and threshold: {threshold}")
-    sorted_human_names = sorted(human_names, key=lambda x: x[0])
-    sorted_countries = sorted(countries, key=lambda x: x[0])
-    sorted_dates = sorted(dates, key=lambda x: int(x[0]) if x[0].isdigit() else x[0])
-    sorted_places = sorted(places, key=lambda x: x[0])
-    sorted_cities = sorted(cities, key=lambda x: x[0])
+# Function to get the path of the per-page CSV file of a bio page
+def page_csv_path(folder_name, bio_url):
+    return os.path.join(folder_name, bio_url.split('/')[-1].replace('.aspx', '') + '.csv')
 
-    return sorted_human_names, sorted_countries, sorted_dates, sorted_places, sorted_cities
+# Function to pass the saved results of an unchanged page on to the output sink,
+# from its CSV file or, when there is none, from the sink's entity store
+def reuse_page_results(bio_url, folder_name, sink):
+    csv_name = page_csv_path(folder_name, bio_url)
+    if sink.store is not None and not os.path.exists(csv_name):
+        sink.write(sink.store.page_rows(bio_url), page=bio_url)
+        return
 
-# Function to process content and save results
-def process_bio_page(bio_url, biography_content, folder_name, website_type):
-    os.makedirs(folder_name, exist_ok=True)
+    with open(csv_name, mode='r', newline='', encoding='utf-8-sig') as page_file:
+        reader = csv.reader(page_file)
+        next(reader)  # Skip the header row
+        rows = [[link, entity, label, int(count)] for link, entity, label, count in reader]
+
+    sink.write(rows, page=bio_url)
+
+# Function to get the language of a bio page from its URL
+def detect_language(bio_url, website_type):
     if website_type == 2:
         if "/en/" in bio_url.lower():
-            language = "English"
+            return "English"
         elif "/ar/" in bio_url.lower():
-            language = "Arabic"
+            return "Arabic"
         else:
             raise ValueError("Language not recognized. URL must contain '/en/' or '/ar/'.")
     elif website_type == 1:
         if "/en/" in bio_url.lower():
-            language = "English"
+            return "English"
         elif "/ar/" in bio_url.lower():
-            language = "Arabic"
+            return "Arabic"
         else:
             raise ValueError("Language not recognized. URL must contain '/en/' or '/ar/'.")
     else:
         raise ValueError("Invalid website_type provided. Must be 1 or 2.")
 
+# Function to extract the entities of a page and count their occurrences
+def count_entities(bio_url, biography_content, website_type):
+    language = detect_language(bio_url, website_type)
 
     human_names, countries, dates, places, cities = extract_entities(biography_content, bio_url, website_type, language)
 
     entity_label_counts = Counter()
     all_entities_set = set(human_names).union(set(countries), set(dates), set(places), set(cities))
 
-    for entity_tuple in all_entities_set:
-        entity = entity_tuple[0]
-        count = sum(chunk.count(entity) for chunk in biography_content)
-        label = entity_tuple[1]
-        entity_label_counts[(entity, label)] = count
+    # Count every entity in one pass over the whole text, so entities across chunk boundaries count too
+    occurrences = count_occurrences(document_text(biography_content), {entity for entity, _ in all_entities_set})
+    for entity, label in all_entities_set:
+        entity_label_counts[(entity, label)] = occurrences[entity]
 
-    sorted_entity_counts = sorted(entity_label_counts.items(), key=lambda x: x[0])
+    return sorted(entity_label_counts.items(), key=lambda x: x[0])
 
-    csv_name = os.path.join(folder_name, bio_url.split('/')[-1].replace('.aspx', '') + '.csv')
+# Function to save the entity counts of a page and generate its word cloud and graphs.
+# Without page_files only the sink gets the rows, and no per-page CSV, word cloud or graphs are made.
+# With a renderer the word cloud and graphs are queued to it instead of being drawn here.
+def save_page_results(bio_url, sorted_entity_counts, folder_name, sink, page_files=True, renderer=None):
+    rows = [[bio_url, entity, label, count] for (entity, label), count in sorted_entity_counts]
 
-    with open(csv_name, mode='w', newline='', encoding='utf-8-sig') as csv_file:
-        writer = csv.writer(csv_file)
-        writer.writerow(['Link', 'Entity', 'Label', 'Occurrences'])
-        for (entity, label), count in sorted_entity_counts:
-            writer.writerow([bio_url, entity, label, count])
+    if page_files:
+        os.makedirs(folder_name, exist_ok=True)
+        csv_name = page_csv_path(folder_name, bio_url)
 
-    print(f"\nEntities saved to {csv_name}")
+        with open(csv_name, mode='w', newline='', encoding='utf-8-sig') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['Link', 'Entity', 'Label', 'Occurrences'])
+            writer.writerows(rows)
 
-    word_cloud_image = generate_word_cloud(csv_name, [bio_url], os.path.join(folder_name, bio_url.split('/')[-1].replace('.aspx', '') + '_wordcloud.png'))
-    graph_image = generate_graphs(csv_name)
-   # if language == "English":
-        #interactive_graph = generate_interactive_graph(csv_name)
+        print(f"\nEntities saved to {csv_name}")
 
-    with open("all_entities.csv", mode='a', newline='', encoding='utf-8-sig') as csv_file:
-        writer = csv.writer(csv_file)
-        for (entity, label), count in sorted_entity_counts:
-            writer.writerow([bio_url, entity, label, count])
+        if renderer is not None:
+            renderer.submit(csv_name, bio_url, folder_name)
+        else:
+            word_cloud_image = generate_word_cloud(csv_name, [bio_url], os.path.join(folder_name, bio_url.split('/')[-1].replace('.aspx', '') + '_wordcloud.png'))
+            graph_image = generate_graphs(csv_name)
+           # if language == "English":
+                #interactive_graph = generate_interactive_graph(csv_name)
+
+    sink.write(rows, page=bio_url)
 
+# Function to process content and save results
+def process_bio_page(bio_url, biography_content, folder_name, website_type, sink=None):
+    sorted_entity_counts = count_entities(bio_url, biography_content, website_type)
+    if sink is None:
+        page_sink = OutputSink(append=True)
+        save_page_results(bio_url, sorted_entity_counts, folder_name, page_sink)
+        page_sink.close()
+    else:
+        save_page_results(bio_url, sorted_entity_counts, folder_name, sink)
@@ -0,0 +1,161 @@
+import gzip
+import json
+import os
+import threading
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+
+import requests
+
+from fetching import fetch, fetch_stream
+from frontier import canonicalize_url
+
+
+# Function to strip the XML namespace from a tag name
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+# Function to read the Sitemap: entries of a site's robots.txt
+def sitemaps_from_robots(base_url):
+    robots_url = urljoin(base_url, "/robots.txt")
+    try:
+        page = fetch(robots_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {robots_url}: {e}")
+        return []
+    if page.status != 200:
+        return []
+
+    sitemap_urls = []
+    for line in page.text.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip().lower() == "sitemap" and value.strip():
+            sitemap_urls.append(urljoin(robots_url, value.strip()))
+    return sitemap_urls
+
+# Generator that stream-parses a sitemap or sitemap index, yielding (url, lastmod) for every page entry
+def iter_sitemap(sitemap_url, visited_sitemaps=None):
+    if visited_sitemaps is None:
+        visited_sitemaps = set()
+    if sitemap_url in visited_sitemaps:
+        return
+    visited_sitemaps.add(sitemap_url)
+
+    try:
+        response = fetch_stream(sitemap_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {sitemap_url}: {e}")
+        return
+
+    child_sitemaps = []
+    with response:
+        if response.status_code != 200:
+            return
+        response.raw.decode_content = True  # Undo any Content-Encoding: gzip
+        stream = response.raw
+        # A gzipped sitemap file such as sitemap.xml.gz still needs decompressing after transfer decoding
+        is_gzip_file = sitemap_url.endswith(".gz") or "gzip" in response.headers.get("Content-Type", "")
+        if is_gzip_file and "gzip" not in response.headers.get("Content-Encoding", ""):
+            stream = gzip.GzipFile(fileobj=stream)
+
+        loc = lastmod = None
+        try:
+            for event, element in ET.iterparse(stream, events=("end",)):
+                tag = local_name(element.tag)
+                if tag == "loc":
+                    loc = (element.text or "").strip()
+                elif tag == "lastmod":
+                    lastmod = (element.text or "").strip() or None
+                elif tag in ("url", "sitemap"):
+                    if loc:
+                        if tag == "url":
+                            yield loc, lastmod
+                        else:
+                            child_sitemaps.append(urljoin(sitemap_url, loc))
+                    loc = lastmod = None
+                    element.clear()  # Keep memory flat on sitemaps with tens of thousands of entries
+        except (ET.ParseError, OSError, EOFError) as e:
+            print(f"Error parsing sitemap {sitemap_url}: {e}")
+
+    # Follow the sitemaps listed by a sitemap index once the index itself is closed
+    for child_url in child_sitemaps:
+        yield from iter_sitemap(child_url, visited_sitemaps)
+
+# Function to find the pages under url_path listed in a site's sitemaps.
+# Returns a dict of canonical URL to lastmod, or None if the site has no usable sitemap.
+def discover_from_sitemaps(base_url, url_path, is_target_url):
+    sitemap_urls = sitemaps_from_robots(base_url) or [urljoin(base_url, "/sitemap.xml")]
+
+    entries = {}
+    found_sitemap = False
+    for sitemap_url in sitemap_urls:
+        for url, lastmod in iter_sitemap(sitemap_url):
+            found_sitemap = True
+            url = canonicalize_url(url, sitemap_url)
+            if is_target_url(url, url_path):
+                entries[url] = lastmod
+
+    if not found_sitemap:
+        return None
+    return entries
+
+# Function to load the lastmod values saved by an earlier run
+def load_lastmods(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, mode='r', encoding='utf-8') as file:
+        return json.load(file)
+
+# Function to save lastmod values, keeping entries from earlier runs that were not seen this time
+def save_lastmods(path, lastmods):
+    merged = load_lastmods(path)
+    merged.update({url: lastmod for url, lastmod in lastmods.items() if lastmod})
+    with open(path, mode='w', encoding='utf-8') as file:
+        json.dump(merged, file, ensure_ascii=False, indent=0)
+
+
+class LastmodLog:
+    """
+    The sitemap lastmod of every page processed so far.
+
+    A lastmod seen in the sitemaps is only kept in memory until commit(url) is called
+    once the page's results are saved, so a page that fails is not taken as unchanged
+    on the next run. save writes the committed values, keeping those of pages not
+    seen this time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.saved = load_lastmods(path)
+        self.pending = {}
+        self.changed = False
+
+    def unchanged(self, url, lastmod):
+        with self.lock:
+            return bool(lastmod) and self.saved.get(url) == lastmod
+
+    def expect(self, url, lastmod):
+        """Keep the lastmod found for a page until the page is saved."""
+        if lastmod:
+            with self.lock:
+                self.pending[url] = lastmod
+
+    def commit(self, url):
+        with self.lock:
+            lastmod = self.pending.pop(url, None)
+            if lastmod and self.saved.get(url) != lastmod:
+                self.saved[url] = lastmod
+                self.changed = True
+
+    def discard(self, url):
+        with self.lock:
+            self.pending.pop(url, None)
+
+    def save(self):
+        with self.lock:
+            if not self.path or not self.changed:
+                return
+            lastmods = dict(self.saved)
+            self.changed = False
+        save_lastmods(self.path, lastmods)
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class HostThrottle:
+    """
+    Rate controller for a single host.
+
+    Requests must hold a concurrency slot and a token before they are sent. The number of
+    slots follows additive-increase/multiplicative-decrease: it grows by about one per
+    round of successful, fast responses and is cut by `decrease_factor` when the host
+    answers slowly, with an error or with a rate-limit status. The token bucket caps the
+    request rate at `rate` per second with bursts of up to `burst`, and a Retry-After
+    header blocks the host until the time it asks for.
+    """
+
+    def __init__(self, rate=5.0, burst=5, initial_concurrency=2, min_concurrency=1, max_concurrency=16,
+                 target_latency=2.0, decrease_factor=0.5):
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.limit = float(initial_concurrency)
+        self.in_flight = 0
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a slot and a token if both are free, returning 0, or the seconds to wait before trying again."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.in_flight >= int(self.limit):
+                return 0.05
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+            self.in_flight += 1
+            return 0
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, latency, status=None, error=False, retry_after=None):
+        """
+        Give back a slot and adjust the concurrency limit from the outcome of the request.
+
+        Args:
+            latency (float): Seconds the request took.
+            status (int): HTTP status code, if a response was received.
+            error (bool): True if the request failed without a response.
+            retry_after (float): Seconds the host asked us to wait, if any.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+            congested = error or status == 429 or (status is not None and status >= 500) or latency > self.target_latency
+            if congested:
+                self.failures += 1
+                # Only back off once per round trip so one burst of errors is one congestion event
+                if now - self.last_decrease >= latency:
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+            else:
+                self.successes += 1
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "successes": self.successes,
+                "failures": self.failures,
+            }
+
+
+class RateController:
+    """Registry of HostThrottle objects, one per host, created on first use."""
+
+    def __init__(self, **throttle_options):
+        self.throttle_options = throttle_options
+        self.throttles = {}
+        self.lock = threading.Lock()
+
+    def configure(self, **throttle_options):
+        """Change the options of the throttles created from now on."""
+        with self.lock:
+            self.throttle_options.update(throttle_options)
+
+    def for_url(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            if host not in self.throttles:
+                self.throttles[host] = HostThrottle(**self.throttle_options)
+            return self.throttles[host]
+
+    def stats(self):
+        with self.lock:
+            throttles = dict(self.throttles)
+        return {host: throttle.stats() for host, throttle in throttles.items()}
+
+
+# Controller shared by the crawler and the scraper so both respect the same per-host limits
+rate_controller = RateController()
@@ -0,0 +1,142 @@
+import glob
+import gzip
+import os
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from http.client import responses as STATUS_REASONS
+
+from requests.structures import CaseInsensitiveDict
+
+# Headers that describe the transfer rather than the stored body, which is kept decoded
+TRANSFER_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+class WarcWriter:
+    """
+    Appends fetched pages to a WARC/1.0 file as gzip-compressed response records.
+
+    Each record is its own gzip member, so the file can be read record by record and
+    concatenated with other archives. Bodies are stored as delivered after transfer
+    decoding, with Content-Length rewritten to match.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, mode='ab')
+
+    def write(self, url, page):
+        reason = STATUS_REASONS.get(page.status, "")
+        http_headers = [f"HTTP/1.1 {page.status} {reason}"]
+        http_headers += [f"{name}: {value}" for name, value in page.headers.items() if name.lower() not in TRANSFER_HEADERS]
+        http_headers.append(f"Content-Length: {len(page.body)}")
+        block = ("\r\n".join(http_headers) + "\r\n\r\n").encode("utf-8") + page.body
+
+        warc_headers = [
+            "WARC/1.0",
+            "WARC-Type: response",
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+            f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+            f"WARC-Target-URI: {url}",
+            "Content-Type: application/http;msgtype=response",
+            f"Content-Length: {len(block)}",
+        ]
+        record = ("\r\n".join(warc_headers) + "\r\n\r\n").encode("utf-8") + block + b"\r\n\r\n"
+
+        with self.lock:
+            self.file.write(gzip.compress(record))
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+# Generator over the gzip members of a WARC file, yielding (offset, record bytes)
+def iter_members(path, read_size=1 << 16):
+    with open(path, mode='rb') as file:
+        offset = 0
+        data = b""
+        while True:
+            decompressor = zlib.decompressobj(wbits=31)
+            parts = []
+            consumed = 0
+            while not decompressor.eof:
+                if not data:
+                    data = file.read(read_size)
+                    if not data:
+                        return
+                parts.append(decompressor.decompress(data))
+                consumed += len(data) - len(decompressor.unused_data)
+                data = decompressor.unused_data
+            yield offset, b"".join(parts)
+            offset += consumed
+
+# Function to split a WARC record into its WARC headers and content block
+def parse_record(record):
+    head, _, block = record.partition(b"\r\n\r\n")
+    headers = CaseInsensitiveDict()
+    for line in head.decode("utf-8").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    length = int(headers.get("Content-Length", len(block)))
+    return headers, block[:length]
+
+# Function to split an HTTP response block into status, headers and body
+def parse_http_response(block):
+    head, _, body = block.partition(b"\r\n\r\n")
+    lines = head.decode("iso-8859-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = CaseInsensitiveDict()
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    return status, headers, body
+
+
+class WarcArchive:
+    """
+    Read-only view of one or more WARC files, indexed by target URI.
+
+    The index maps each URL to the file and offset of its latest response record, so a
+    lookup decompresses a single gzip member.
+    """
+
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = sorted(path for pattern in paths for path in glob.glob(pattern))
+        self.index = {}
+        for path in self.paths:
+            for offset, record in iter_members(path):
+                headers, _ = parse_record(record)
+                if headers.get("WARC-Type") == "response":
+                    self.index[headers["WARC-Target-URI"]] = (path, offset)
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, url):
+        """Return the archived response for a URL as (status, headers, body), or None if it was not archived."""
+        if url not in self.index:
+            return None
+        path, offset = self.index[url]
+        with open(path, mode='rb') as file:
+            file.seek(offset)
+            decompressor = zlib.decompressobj(wbits=31)
+            parts = []
+            while not decompressor.eof:
+                data = file.read(1 << 16)
+                if not data:
+                    break
+                parts.append(decompressor.decompress(data))
+        _, block = parse_record(b"".join(parts))
+        return parse_http_response(block)